@@ -0,0 +1,82 @@
+import csv
+from functools import lru_cache
+from itertools import chain
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+
+SHOPPING_LIST_TITLE = 'Список покупок:'
+SHOPPING_LIST_FOOTER = ('\n\n Foodgram copyright by sonneee'
+                        '\n\n Github: https://github.com/sonneee/')
+PDF_FONT = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_TITLE_SIZE = 16
+PDF_MARGIN = 50
+PDF_LEADING = 18
+PDF_SPOOL_SIZE = 1024 * 1024
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def render_txt(ingredients):
+    yield SHOPPING_LIST_TITLE
+    for ingredient in ingredients:
+        yield (f'\n\u22C5 {ingredient["ingredient__name"]}, '
+               f'({ingredient["ingredient__measurement_unit"]}) '
+               f'----- {ingredient["total"]}')
+    yield SHOPPING_LIST_FOOTER
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Единица измерения', 'Количество'))
+    for ingredient in ingredients:
+        yield writer.writerow((ingredient['ingredient__name'],
+                               ingredient['ingredient__measurement_unit'],
+                               ingredient['total']))
+
+
+@lru_cache(maxsize=None)
+def register_pdf_font():
+    pdfmetrics.registerFont(TTFont(PDF_FONT, settings.PDF_FONT_PATH))
+
+
+def render_pdf(ingredients):
+    register_pdf_font()
+    _, height = A4
+    with SpooledTemporaryFile(max_size=PDF_SPOOL_SIZE) as file:
+        canvas = Canvas(file, pagesize=A4)
+        canvas.setFont(PDF_FONT, PDF_TITLE_SIZE)
+        canvas.drawString(PDF_MARGIN, height - PDF_MARGIN,
+                          SHOPPING_LIST_TITLE)
+        y = height - PDF_MARGIN - PDF_LEADING * 2
+        lines = (f'\u2022 {ingredient["ingredient__name"]} '
+                 f'({ingredient["ingredient__measurement_unit"]}) '
+                 f'— {ingredient["total"]}' for ingredient in ingredients)
+        footer = (line.strip() for line in SHOPPING_LIST_FOOTER.split('\n'))
+        canvas.setFont(PDF_FONT, PDF_FONT_SIZE)
+        for line in chain(lines, footer):
+            if y < PDF_MARGIN:
+                canvas.showPage()
+                canvas.setFont(PDF_FONT, PDF_FONT_SIZE)
+                y = height - PDF_MARGIN
+            canvas.drawString(PDF_MARGIN, y, line)
+            y -= PDF_LEADING
+        canvas.save()
+        file.seek(0)
+        yield from iter(lambda: file.read(PDF_CHUNK_SIZE), b'')
+
+
+RENDERERS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
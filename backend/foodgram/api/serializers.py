@@ -1,21 +1,49 @@
-import base64
+import binascii
+from functools import partial
+from tempfile import SpooledTemporaryFile
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
-from django.db.models import F
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from PIL import Image
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from recipes.models import (Favorite, Follow, Ingredient,
+from core.serializers import ProfiledSerializerMixin
+from recipes import catalog, images
+from recipes.models import (AuthorStats, Favorite, Follow, Ingredient,
                             IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingCartTotal, Tag)
 
 MAX_LENGTH = 150
+MAX_BATCH_SIZE = 100
+BASE64_CHUNK_SIZE = 64 * 1024
+BASE64_LINE_LENGTH = 76
+IMAGE_SPOOL_SIZE = 1024 * 1024
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 0),
+    (b'\x89PNG\r\n\x1a\n', 0),
+    (b'GIF87a', 0),
+    (b'GIF89a', 0),
+    (b'WEBP', 8),
+)
+IMAGE_SIGNATURE_SIZE = max(offset + len(signature)
+                           for signature, offset in IMAGE_SIGNATURES)
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+def prefetch_ingredient_amounts():
+    return Prefetch('ingredientrecipe',
+                    queryset=IngredientRecipe.objects.select_related(
+                        'ingredient'))
+
+
+class UserSerializer(ProfiledSerializerMixin,
+                     serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
@@ -23,14 +51,18 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'email', 'username', 'first_name',
                   'last_name', 'is_subscribed')
 
+    def get_subscriptions(self):
+        if 'subscriptions' not in self.context:
+            subscriptions = set()
+            request = self.context.get("request")
+            if request and request.user.is_authenticated:
+                subscriptions = set(Follow.objects.filter(
+                    user=request.user).values_list('author_id', flat=True))
+            self.context['subscriptions'] = subscriptions
+        return self.context['subscriptions']
+
     def get_is_subscribed(self, obj):
-        request = self.context.get("request")
-        if request:
-            user = self.context.get("request").user
-            if user.is_authenticated:
-                return Follow.objects.filter(user=user,
-                                             author=obj).exists()
-        return False
+        return obj.id in self.get_subscriptions()
 
 
 class UserSignUpSerializer(serializers.ModelSerializer):
@@ -99,53 +131,173 @@ class NewPasswordSerializer(serializers.BaseSerializer):
         return self.to_internal_value(data)
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(ProfiledSerializerMixin,
+                    serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = ('id', 'name', 'color', 'slug')
 
 
 class Base64ImageField(serializers.ImageField):
+    default_error_messages = {
+        'invalid_base64': 'Изображение должно быть передано в base64',
+        'not_image': 'Файл не является изображением',
+        'too_large': 'Размер изображения не должен превышать {max_bytes} '
+                     'байт',
+        'too_many_pixels': 'Изображение не должно содержать больше '
+                           '{max_pixels} пикселей',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            try:
+                format, imgstr = data.split(';base64,')
+            except ValueError:
+                self.fail('invalid_base64')
             ext = format.split('/')[-1]
 
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = self.decode(imgstr, 'temp.' + ext)
 
         return super().to_internal_value(data)
 
+    def decode(self, imgstr, name):
+        max_bytes = settings.RECIPE_IMAGE_MAX_BYTES
+        max_chars = (max_bytes + 2) // 3 * 4
+        line_breaks = max_chars // BASE64_LINE_LENGTH + 1
+        if len(imgstr) > max_chars + line_breaks * 2:
+            self.fail('too_large', max_bytes=max_bytes)
+        file = SpooledTemporaryFile(max_size=IMAGE_SPOOL_SIZE)
+        tail = ''
+        try:
+            for start in range(0, len(imgstr), BASE64_CHUNK_SIZE):
+                chunk = tail + ''.join(
+                    imgstr[start:start + BASE64_CHUNK_SIZE].split())
+                size = len(chunk) // 4 * 4
+                tail = chunk[size:]
+                file.write(binascii.a2b_base64(chunk[:size]))
+            file.write(binascii.a2b_base64(tail))
+        except binascii.Error:
+            self.fail('invalid_base64')
+        if file.tell() > max_bytes:
+            self.fail('too_large', max_bytes=max_bytes)
+        file.seek(0)
+        head = file.read(IMAGE_SIGNATURE_SIZE)
+        if not any(head[offset:offset + len(signature)] == signature
+                   for signature, offset in IMAGE_SIGNATURES):
+            self.fail('not_image')
+        file.seek(0)
+        max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            self.fail('too_many_pixels', max_pixels=max_pixels)
+        except OSError:
+            self.fail('not_image')
+        if width * height > max_pixels:
+            self.fail('too_many_pixels', max_pixels=max_pixels)
+        file.seek(0)
+        file = images.strip_metadata(
+            file, partial(SpooledTemporaryFile, max_size=IMAGE_SPOOL_SIZE))
+        return File(file, name=name)
+
+
+class ImageRenditionsField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        renditions = {}
+        for name, path in value.items():
+            url = default_storage.url(path)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            renditions[name] = url
+        return renditions
+
+
+class RecipeBaseSerializer(ProfiledSerializerMixin,
+                           serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField()
 
-class RecipeBaseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
+
+
+class RecipeMatchSerializer(RecipeBaseSerializer):
+    matched_count = serializers.SerializerMethodField(read_only=True)
+    missing_count = serializers.SerializerMethodField(read_only=True)
+    missing_ingredients = serializers.SerializerMethodField(read_only=True)
 
+    class Meta(RecipeBaseSerializer.Meta):
+        fields = RecipeBaseSerializer.Meta.fields + (
+            'matched_count', 'missing_count', 'missing_ingredients')
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+    def get_missing_ingredients(self, obj):
+        return [ingredient_id for ingredient_id in obj.ingredient_ids
+                if ingredient_id not in self.context['ingredients']]
+
+    def get_missing_count(self, obj):
+        return len(self.get_missing_ingredients(obj))
+
+    def get_matched_count(self, obj):
+        return len(obj.ingredient_ids) - self.get_missing_count(obj)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE,
+        error_messages={
+            'empty': 'Список рецептов не может быть пустым',
+            'max_length': ('За один запрос можно передать не больше '
+                           '{max_length} рецептов'),
+        }
+    )
+
+
+class IngredientAmountSerializer(ProfiledSerializerMixin,
+                                 serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        model = IngredientRecipe
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class ShoppingCartTotalSerializer(IngredientAmountSerializer):
+
+    class Meta(IngredientAmountSerializer.Meta):
+        model = ShoppingCartTotal
+
+
+class RecipeGetSerializer(ProfiledSerializerMixin,
+                          serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
-    ingredients = serializers.SerializerMethodField(read_only=True)
+    ingredients = IngredientAmountSerializer(source='ingredientrecipe',
+                                             many=True, read_only=True)
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     image = Base64ImageField()
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'ingredients', 'tags', 'image', 'name', 'text',
-                  'author', 'cooking_time', 'is_favorited',
-                  'is_in_shopping_cart')
-
-    def get_ingredients(self, obj):
-        ingredients = obj.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('recping__amount')
-        )
-        return ingredients
+        fields = ('id', 'ingredients', 'tags', 'image', 'image_renditions',
+                  'name', 'text', 'author', 'cooking_time', 'is_favorited',
+                  'is_in_shopping_cart', 'favorites_count', 'in_carts_count')
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         if user.is_authenticated:
             return Favorite.objects.filter(user=user,
@@ -153,6 +305,8 @@ class RecipeGetSerializer(serializers.ModelSerializer):
         return False
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         if user.is_authenticated:
             return ShoppingCart.objects.filter(user=user,
@@ -168,9 +322,21 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
+class CatalogTagField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            tag = catalog.get_tags().get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if tag is None:
+            self.fail('does_not_exist', pk_value=data)
+        return tag
+
+
 class RecipeCreateSerializer(serializers.ModelSerializer):
-    tags = serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all(),
-                                              many=True)
+    tags = CatalogTagField(queryset=Tag.objects.all(), many=True)
     author = UserSerializer(read_only=True)
     ingredients = IngredientRecipeSerializer(many=True)
     image = Base64ImageField()
@@ -207,9 +373,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                                              'повторяться']
                 else:
                     ingr_ids[id_now] = 1
-            ingr_in_base = Ingredient.objects.filter(
-                id__in=ingr_ids.keys()).count()
-            if ingr_in_base != len(ingr_ids):
+            if ingr_ids.keys() - catalog.get_ingredients().keys():
                 errors['ingredients'] = ['Указан несуществующий '
                                          'ингредиент']
         if errors:
@@ -221,19 +385,40 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         errors = {}
         if not tags:
             errors['tags'] = ['Обязательное поле']
-        else:
-            tag_ids = []
-            for tag in tags:
-                tag_ids.append(tag.id)
-            if len(list(tags)) != len(set(tags)):
-                errors['tags'] = ['Теги не должны повторяться']
-            tag_count = Tag.objects.filter(id__in=tag_ids).count()
-            if tag_count != len(set(tags)):
-                errors['tags'] = ['Указан несуществующий тег']
+        elif len(list(tags)) != len(set(tags)):
+            errors['tags'] = ['Теги не должны повторяться']
         if errors:
             raise serializers.ValidationError(errors)
         return data
 
+    def set_ingredients(self, recipe, ingredients):
+        amounts = {ingredient['id']: ingredient['amount']
+                   for ingredient in ingredients}
+        existing = {row.ingredient_id: row
+                    for row in recipe.ingredientrecipe.all()}
+        removed = existing.keys() - amounts.keys()
+        changed = [row for ingredient_id, row in existing.items()
+                   if ingredient_id in amounts
+                   and row.amount != amounts[ingredient_id]]
+        added = [IngredientRecipe(ingredient_id=ingredient_id,
+                                  recipe=recipe,
+                                  amount=amounts[ingredient_id])
+                 for ingredient_id in amounts.keys() - existing.keys()]
+        if not (removed or changed or added):
+            return
+        ShoppingCartTotal.objects.remove_recipe(recipe.id)
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        if changed:
+            for row in changed:
+                row.amount = amounts[row.ingredient_id]
+            IngredientRecipe.objects.bulk_update(changed, ('amount',))
+        if added:
+            IngredientRecipe.objects.bulk_create(added)
+        ShoppingCartTotal.objects.add_recipe(recipe.id)
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.get('tags')
         ingredients = validated_data.get('ingredients')
@@ -244,13 +429,19 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                                            'cooking_time'),
                                        image=validated_data.get('image'))
         recipe.tags.set(tags)
-        ingredients_recipe = [IngredientRecipe(
-            ingredient=Ingredient.objects.get(id=ingredient['id']),
-            recipe=recipe,
-            amount=ingredient['amount']) for ingredient in ingredients]
-        IngredientRecipe.objects.bulk_create(ingredients_recipe)
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(ingredient_id=ingredient['id'],
+                             recipe=recipe,
+                             amount=ingredient['amount'])
+            for ingredient in ingredients)
+        Recipe.objects.filter(pk=recipe.pk).refresh_search_index()
+        AuthorStats.objects.change_counters(recipe.author_id, recipes_count=1)
+        if recipe.image:
+            transaction.on_commit(
+                partial(images.schedule_renditions, recipe.id))
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.get('ingredients')
         tags = validated_data.get('tags')
@@ -258,7 +449,12 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         instance.text = validated_data.get("text", instance.text)
         instance.cooking_time = validated_data.get("cooking_time",
                                                    instance.cooking_time)
-        instance.image = validated_data.get("image", instance.image)
+        if 'image' in validated_data:
+            stale = list(instance.image_renditions.values())
+            instance.image = validated_data['image']
+            instance.image_renditions = {}
+            transaction.on_commit(
+                partial(images.schedule_renditions, instance.id, stale))
         errors = {}
         if tags is None:
             errors['tags'] = ['Обязательное поле']
@@ -266,60 +462,58 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             errors['ingridients'] = ['Обязательное поле']
         if errors:
             raise serializers.ValidationError(errors)
-        instance.tags.clear()
         instance.tags.set(tags)
-        instance.ingredients.clear()
-        ingredients_recipe = [IngredientRecipe(
-            ingredient=Ingredient.objects.get(id=ingredient['id']),
-            recipe=instance,
-            amount=ingredient['amount']) for ingredient in ingredients]
-        IngredientRecipe.objects.bulk_create(ingredients_recipe)
+        self.set_ingredients(instance, ingredients)
         instance.save()
+        Recipe.objects.filter(pk=instance.pk).refresh_search_index()
         return instance
 
     def to_representation(self, instance):
-        request = self.context['request']
-        context = {'request': request}
-        return RecipeGetSerializer(instance, context=context).data
+        prefetch_related_objects([instance], 'tags',
+                                 prefetch_ingredient_amounts())
+        return RecipeGetSerializer(instance, context=self.context).data
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(ProfiledSerializerMixin,
+                           serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField(read_only=True)
     recipes_count = serializers.SerializerMethodField(read_only=True)
-    is_subscribed = serializers.SerializerMethodField(read_only=True)
+    followers_count = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'recipes', 'recipes_count')
+                  'is_subscribed', 'recipes', 'recipes_count',
+                  'followers_count')
+
+    def get_stats(self, obj):
+        return getattr(obj, 'stats', None) or AuthorStats(author=obj)
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+        return self.get_stats(obj).recipes_count
 
-    def get_is_subscribed(self, obj):
+    def get_followers_count(self, obj):
+        return self.get_stats(obj).followers_count
+
+    def get_recipes_limit(self):
         request = self.context.get("request")
         if request:
-            user = self.context.get("request").user
-            if user.is_authenticated:
-                return Follow.objects.filter(user=user,
-                                             author=obj).exists()
-        return False
+            return int(request.GET.get('recipes_limit', default=0))
+        return 0
 
     def get_recipes(self, obj):
-        request = self.context.get("request")
-        if request:
-            recipes_limit = int(request.GET.get('recipes_limit',
-                                                default=0))
+        if 'recipes' in self.context:
+            recipes = self.context['recipes'].get(obj.id, [])
         else:
-            recipes_limit = 0
-        recipes = Recipe.objects.filter(author=obj).all()
-        if recipes_limit > 0:
-            recipes = recipes[:recipes_limit]
+            recipes = Recipe.objects.filter(author=obj).all()
+            recipes_limit = self.get_recipes_limit()
+            if recipes_limit > 0:
+                recipes = recipes[:recipes_limit]
         serializer = RecipeBaseSerializer(recipes, many=True, read_only=True)
         return serializer.data
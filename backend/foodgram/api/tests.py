@@ -0,0 +1,289 @@
+import base64
+import io
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from recipes import catalog
+from recipes.models import (Favorite, Follow, Ingredient, IngredientRecipe,
+                            Recipe, ShoppingCart, Tag)
+
+User = get_user_model()
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-default',
+    },
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests-versions',
+    },
+}
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (2, 2), 'white').save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class CacheResetMixin:
+
+    def reset(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        catalog._loaded.clear()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeListQueriesTest(CacheResetMixin, APITestCase):
+    page_size = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass')
+        author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass')
+        tags = [Tag.objects.create(name=f'Тег {index}', color='#000000',
+                                   slug=f'tag-{index}')
+                for index in range(2)]
+        ingredients = [Ingredient.objects.create(
+            name=f'Ингредиент {index}', measurement_unit='г')
+            for index in range(3)]
+        for index in range(cls.page_size):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {index}', text='Описание',
+                cooking_time=10)
+            recipe.tags.set(tags)
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                                 amount=index + 1)
+                for ingredient in ingredients)
+            if index % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            else:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, params):
+        self.reset()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def assert_constant_queries(self, **params):
+        expected = self.count_queries({**params, 'limit': 1})
+        self.reset()
+        with self.assertNumQueries(expected):
+            response = self.client.get(
+                '/api/recipes/', {**params, 'limit': self.page_size})
+        self.assertGreater(len(response.data['results']), 1)
+
+    def test_shared_feed_queries_do_not_grow_with_page_size(self):
+        self.assert_constant_queries()
+
+    def test_personal_filter_queries_do_not_grow_with_page_size(self):
+        for params in ({'is_favorited': 1}, {'is_in_shopping_cart': 1}):
+            with self.subTest(**params):
+                self.assert_constant_queries(**params)
+
+    def test_cursor_page_queries_do_not_grow_with_page_size(self):
+        self.assert_constant_queries(cursor='')
+
+    def test_flags_come_from_the_list_query(self):
+        response = self.client.get('/api/recipes/',
+                                   {'limit': self.page_size})
+        flags = {recipe['id']: (recipe['is_favorited'],
+                                recipe['is_in_shopping_cart'])
+                 for recipe in response.data['results']}
+        favorites = set(Favorite.objects.filter(
+            user=self.user).values_list('recipe_id', flat=True))
+        self.assertEqual(flags, {
+            pk: (pk in favorites, pk not in favorites) for pk in flags})
+
+
+@override_settings(CACHES=LOCMEM_CACHES, MEDIA_ROOT=MEDIA_ROOT)
+class RecipeWriteQueriesTest(CacheResetMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass')
+        cls.tags = [Tag.objects.create(name=f'Тег {index}', color='#000000',
+                                       slug=f'tag-{index}')
+                    for index in range(4)]
+        cls.ingredients = [Ingredient.objects.create(
+            name=f'Ингредиент {index}', measurement_unit='г')
+            for index in range(60)]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_authenticate(self.author)
+
+    def payload(self, ingredients, tags):
+        return {
+            'name': 'Рецепт', 'text': 'Описание', 'cooking_time': 10,
+            'image': make_image(),
+            'tags': [tag.id for tag in tags],
+            'ingredients': [{'id': ingredient.id, 'amount': 5}
+                            for ingredient in ingredients],
+        }
+
+    def count_queries(self, method, url, data):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertIn(response.status_code, (200, 201), response.data)
+        return len(context), response.data
+
+    def write(self, size):
+        self.reset()
+        created, recipe = self.count_queries(
+            'post', '/api/recipes/',
+            self.payload(self.ingredients[:size], self.tags[:2]))
+        updated, _ = self.count_queries(
+            'patch', f'/api/recipes/{recipe["id"]}/',
+            self.payload(self.ingredients[size:2 * size], self.tags[2:]))
+        self.assertEqual(
+            IngredientRecipe.objects.filter(recipe_id=recipe['id']).count(),
+            size)
+        return created, updated
+
+    def test_queries_do_not_grow_with_ingredient_count(self):
+        self.assertEqual(self.write(2), self.write(30))
+
+    def test_upload_metadata_is_stripped(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        exif[0x0112] = 6
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 2), 'white').save(buffer, 'JPEG', exif=exif)
+        payload = self.payload(self.ingredients[:1], self.tags[:1])
+        payload['image'] = ('data:image/jpeg;base64,'
+                            + base64.b64encode(buffer.getvalue()).decode())
+        response = self.client.post('/api/recipes/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        with recipe.image.open('rb') as file, Image.open(file) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (2, 4))
+            self.assertNotIn('exif', image.info)
+
+    def test_wrapped_image_size_limit(self):
+        buffer = io.BytesIO()
+        noise = Image.frombytes('RGB', (300, 300), os.urandom(270000))
+        noise.save(buffer, 'PNG')
+        size = buffer.tell()
+        payload = self.payload(self.ingredients[:1], self.tags[:1])
+        payload['image'] = ('data:image/png;base64,' + base64.encodebytes(
+            buffer.getvalue()).decode().replace('\n', '\r\n'))
+        for max_bytes, status in ((size - 1, 400), (size, 201)):
+            with self.subTest(max_bytes=max_bytes), self.settings(
+                    RECIPE_IMAGE_MAX_BYTES=max_bytes):
+                response = self.client.post('/api/recipes/', payload,
+                                            format='json')
+                self.assertEqual(response.status_code, status, response.data)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SubscriptionsTest(CacheResetMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass')
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass')
+        for index in range(5):
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {index}', text='Описание',
+                cooking_time=10)
+
+    def setUp(self):
+        self.reset()
+        self.client.force_authenticate(self.user)
+
+    def test_empty_page(self):
+        response = self.client.get('/api/users/subscriptions/',
+                                   {'recipes_limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+
+    def test_recipes_limit(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.client.get('/api/users/subscriptions/',
+                                   {'recipes_limit': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results'][0]['recipes']), 3)
+
+
+class NonDecimalIdTest(APITestCase):
+
+    def test_superscript_digits_are_not_ids(self):
+        user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass')
+        self.client.force_authenticate(user)
+        for url in ('/api/recipes/²/favorite/',
+                    '/api/recipes/²/shopping_cart/',
+                    '/api/users/²/subscribe/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.delete(url).status_code, 404)
+
+
+class IngredientAutocompleteTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('Мука', 'блинная мука', 'молоко'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def test_prefix_matches_rank_first_ignoring_case(self):
+        response = self.client.get('/api/ingredients/autocomplete/',
+                                   {'name': 'мук'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([ingredient['name'] for ingredient in response.data],
+                         ['Мука', 'блинная мука'])
+
+
+class DownloadShoppingCartTest(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass')
+        recipe = Recipe.objects.create(
+            author=cls.user, name='Рецепт', text='Описание', cooking_time=1)
+        for index in range(60):
+            ingredient = Ingredient.objects.create(
+                name=f'Ингредиент {index}', measurement_unit='г')
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=index + 1)
+        ShoppingCart.objects.add(cls.user.id, recipe.id)
+
+    def test_pdf(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/api/recipes/download_shopping_cart/',
+                                   {'type': 'pdf'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertIn(b'/Count 2', content)
@@ -1,6 +1,12 @@
+import hashlib
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http.response import HttpResponse
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Exists, OuterRef, Sum, Value
+from django.http.response import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, views, viewsets
@@ -9,19 +15,54 @@ from rest_framework.filters import SearchFilter
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import AccessToken
 
+from .exports import RENDERERS
 from .serializers import (FollowSerializer, IngredientSerializer,
                           NewPasswordSerializer, RecipeBaseSerializer,
                           RecipeCreateSerializer, RecipeGetSerializer,
-                          TagSerializer, UserSerializer,
-                          UserSignUpSerializer)
-from core.filters import IngredientFilter, RecipeFilter
-from core.pagination import PageNumberLimitPagination
+                          RecipeIdsSerializer, RecipeMatchSerializer,
+                          ShoppingCartTotalSerializer, TagSerializer,
+                          UserSerializer, UserSignUpSerializer,
+                          prefetch_ingredient_amounts)
+from core.decorators import conditional_get, make_etag
+from core.filters import IngredientFilter, RecipeFilter, RecipeOrderingFilter
+from core.pagination import (CursorLimitPagination, FeedPagination,
+                             PageNumberLimitPagination,
+                             SubscriptionsPagination)
 from core.permissions import IsAuthorOrReadOnly
-from recipes.models import (Favorite, Follow, Ingredient, IngredientRecipe,
-                            Recipe, ShoppingCart, Tag)
+from recipes import catalog, matching
+from recipes.models import (AuthorStats, Favorite, Follow, Ingredient,
+                            Recipe, ShoppingCart, ShoppingCartTotal,
+                            SimilarRecipe, Tag)
 
 User = get_user_model()
 
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+MATCH_LIMIT = 20
+MAX_MATCH_LIMIT = 100
+SIMILAR_LIMIT = 10
+MAX_SIMILAR_LIMIT = 20
+FEED_CACHE_KEY = 'recipes:feed:{}:{}:{}:{}'
+FEED_TIMELINE_KEY = 'recipes:timeline:{}:{}:{}'
+FOLLOWS_VERSION = 'follows:{}'
+PERSONAL_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+FAVORITE_ERRORS = ("Рецепт уже добавлен в избранное",
+                   "Рецепт не был добавлен в избранное")
+SHOPPING_CART_ERRORS = ("Рецепт уже добавлен в список покупок",
+                        "Рецепт отсутствует в списке покупок")
+
+
+def to_id(pk):
+    return int(pk) if pk and pk.isdecimal() else None
+
+
+def get_limit(request, default, maximum):
+    try:
+        limit = int(request.query_params.get('limit', default))
+    except ValueError:
+        limit = default
+    return min(max(limit, 1), maximum)
+
 
 class UserViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'delete']
@@ -31,7 +72,7 @@ class UserViewSet(viewsets.ModelViewSet):
     permission_classes = (permissions.AllowAny,)
 
     def get_serializer_class(self):
-        if self.request.method == 'get':
+        if self.request.method in permissions.SAFE_METHODS:
             return UserSerializer
         return UserSignUpSerializer
 
@@ -39,42 +80,49 @@ class UserViewSet(viewsets.ModelViewSet):
             permission_classes=(permissions.IsAuthenticated,), detail=True)
     def subscribe(self, request, pk=None):
         user = request.user
-        author = get_object_or_404(User, pk=pk)
+        author_id = to_id(pk)
         if request.method == 'POST':
-            serializer = FollowSerializer(author,
-                                          context={"request": request})
-            is_subscribed = Follow.objects.filter(author=author,
-                                                  user=user).exists()
-            if is_subscribed:
-                return Response({"errors":
-                                 "Вы уже подписаны на этого автора"},
-                                status=status.HTTP_400_BAD_REQUEST)
-            if user == author:
+            if author_id == user.id:
                 return Response({"errors":
                                  "Нельзя подписаться на самого себя"},
                                 status=status.HTTP_400_BAD_REQUEST)
-            subscription = Follow(user=user, author=author)
-            subscription.save()
-            return Response(serializer.data,
-                            status=status.HTTP_201_CREATED)
+            if author_id and Follow.objects.add(user.id, author_id):
+                transaction.on_commit(lambda: catalog.bump_version(
+                    FOLLOWS_VERSION.format(user.id)))
+                author = get_object_or_404(User, pk=author_id)
+                serializer = FollowSerializer(author,
+                                              context={"request": request})
+                return Response(serializer.data,
+                                status=status.HTTP_201_CREATED)
+            get_object_or_404(User, pk=author_id)
+            return Response({"errors": "Вы уже подписаны на этого автора"},
+                            status=status.HTTP_400_BAD_REQUEST)
 
         if request.method == 'DELETE':
-            deleted = Follow.objects.filter(author=author,
-                                            user=user).delete()
-            if deleted[0] > 0:
+            if author_id and Follow.objects.remove(user.id, author_id):
+                transaction.on_commit(lambda: catalog.bump_version(
+                    FOLLOWS_VERSION.format(user.id)))
                 return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(User, pk=author_id)
             return Response({"errors": "Вы не подписаны на этого автора"},
                             status=status.HTTP_400_BAD_REQUEST)
 
     @action(methods=['get', ],
             permission_classes=(permissions.IsAuthenticated,), detail=False,
-            pagination_class=PageNumberLimitPagination)
+            pagination_class=SubscriptionsPagination)
     def subscriptions(self, request):
         user = request.user
-        subscriptions = User.objects.filter(following__user=user)
+        subscriptions = User.objects.filter(
+            following__user=user).select_related('stats').order_by('id')
         page = self.paginate_queryset(subscriptions)
+        context = {"request": request}
         serializer = FollowSerializer(page, many=True, read_only=True,
-                                      context={"request": request})
+                                      context=context)
+        recipes = {author.id: [] for author in page}
+        for recipe in Recipe.objects.latest_by_author(
+                list(recipes), serializer.child.get_recipes_limit()):
+            recipes[recipe.author_id].append(recipe)
+        context['recipes'] = recipes
         return self.get_paginated_response(serializer.data)
 
 
@@ -138,116 +186,311 @@ class TokenLogoutViewSet(views.APIView):
 
 class RecipeViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
-    queryset = Recipe.objects.prefetch_related('tags',
-                                               'author',
-                                               'ingredients')
-    pagination_class = PageNumberLimitPagination
-    filter_backends = (DjangoFilterBackend,)
+    queryset = Recipe.objects.select_related('author').prefetch_related(
+        'tags', prefetch_ingredient_amounts())
+    pagination_class = FeedPagination
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('pub_date', 'favorites_count', 'in_carts_count')
+    ordering = ('-pub_date', '-id')
     permission_classes = (IsAuthorOrReadOnly,)
 
+    def get_flag_annotations(self, user):
+        if not user.is_authenticated:
+            return {
+                'is_favorited': Value(False, output_field=BooleanField()),
+                'is_in_shopping_cart': Value(False,
+                                             output_field=BooleanField()),
+            }
+        return {
+            'is_favorited': Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            'is_in_shopping_cart': Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        }
+
+    def get_queryset(self):
+        return super().get_queryset().annotate(
+            **self.get_flag_annotations(self.request.user))
+
     def get_serializer_class(self):
-        if self.request.method == 'get':
+        if self.request.method in permissions.SAFE_METHODS:
             return RecipeGetSerializer
         return RecipeCreateSerializer
 
+    def get_object_validators(self, request):
+        user = request.user
+        pk = to_id(self.kwargs['pk'])
+        if pk is None:
+            return None, None
+        recipe = self.get_queryset().prefetch_related(None).filter(
+            pk=pk
+        ).annotate(
+            is_subscribed=Exists(Follow.objects.filter(
+                user_id=user.id, author=OuterRef('author')))
+        ).values('id', 'updated_at', 'is_favorited', 'is_in_shopping_cart',
+                 'is_subscribed', 'favorites_count', 'in_carts_count',
+                 'author__email', 'author__username', 'author__first_name',
+                 'author__last_name').first()
+        if recipe is None:
+            return None, None
+        etag = make_etag(
+            recipe['id'], recipe['updated_at'].isoformat(), user.id,
+            recipe['is_favorited'], recipe['is_in_shopping_cart'],
+            recipe['is_subscribed'], recipe['favorites_count'],
+            recipe['in_carts_count'], recipe['author__email'],
+            recipe['author__username'], recipe['author__first_name'],
+            recipe['author__last_name'], catalog.get_version('tags'),
+            catalog.get_version('ingredients'))
+        return etag, None
+
+    def get_feed_cache_key(self, request):
+        query = sorted((key, sorted(values))
+                       for key, values in request.query_params.lists())
+        digest = hashlib.md5(
+            f'{request.get_host()}?{query}'.encode()).hexdigest()
+        return FEED_CACHE_KEY.format(
+            catalog.get_version('recipes'), catalog.get_version('tags'),
+            catalog.get_version('ingredients'), digest)
+
+    def get_shared_page(self, request):
+        queryset = self.filter_queryset(super().get_queryset().annotate(
+            **self.get_flag_annotations(AnonymousUser())))
+        page = self.paginate_queryset(queryset)
+        context = self.get_serializer_context()
+        context['subscriptions'] = set()
+        serializer = RecipeGetSerializer(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data).data
+
+    def apply_user_overlay(self, recipes, user):
+        fields = ['id', 'favorites_count', 'in_carts_count']
+        queryset = Recipe.objects.filter(
+            id__in=[recipe['id'] for recipe in recipes])
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(Follow.objects.filter(
+                    user=user, author=OuterRef('author'))),
+                **self.get_flag_annotations(user))
+            fields += ['is_favorited', 'is_in_shopping_cart',
+                       'is_subscribed']
+        rows = {row.pop('id'): row for row in queryset.values(*fields)}
+        for recipe in recipes:
+            row = rows.get(recipe['id'])
+            if row is None:
+                continue
+            recipe['author']['is_subscribed'] = row.pop('is_subscribed',
+                                                        False)
+            recipe.update(row)
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated and any(
+                request.query_params.get(name) for name in PERSONAL_FILTERS):
+            return super().list(request, *args, **kwargs)
+        key = self.get_feed_cache_key(request)
+        data = cache.get(key)
+        if data is None:
+            data = self.get_shared_page(request)
+            cache.set(key, data, settings.RECIPE_FEED_CACHE_TTL)
+        self.apply_user_overlay(data['results'], request.user)
+        return Response(data)
+
+    def get_timeline(self, user):
+        key = FEED_TIMELINE_KEY.format(
+            user.id, catalog.get_version('recipes'),
+            catalog.get_version(FOLLOWS_VERSION.format(user.id)))
+        timeline = cache.get(key)
+        if timeline is None:
+            follows = Follow.objects.filter(user=user)
+            timeline = {'ids': None}
+            if follows.count() >= settings.RECIPE_FEED_TIMELINE_MIN_FOLLOWS:
+                timeline['ids'] = list(Recipe.objects.filter(
+                    author_id__in=follows.values('author_id')
+                ).order_by(*self.ordering).values_list('id', flat=True)[
+                    :settings.RECIPE_FEED_TIMELINE_SIZE])
+            cache.set(key, timeline, settings.RECIPE_FEED_CACHE_TTL)
+        return timeline['ids']
+
+    def get_feed_queryset(self, user):
+        timeline = self.get_timeline(user)
+        if timeline is None:
+            return self.get_queryset().filter(
+                author_id__in=Follow.objects.filter(
+                    user=user).values('author_id'))
+        return self.get_queryset().filter(id__in=timeline)
+
+    @action(methods=['get'],
+            permission_classes=(permissions.IsAuthenticated,), detail=False,
+            pagination_class=CursorLimitPagination, filter_backends=())
+    def feed(self, request):
+        page = self.paginate_queryset(self.get_feed_queryset(request.user))
+        context = self.get_serializer_context()
+        context['subscriptions'] = {recipe.author_id for recipe in page}
+        serializer = RecipeGetSerializer(page, many=True, context=context)
+        return self.get_paginated_response(serializer.data)
+
+    @conditional_get('get_object_validators')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-    @action(methods=['post', 'delete'],
-            permission_classes=(permissions.IsAuthenticated,), detail=True)
-    def favorite(self, request, pk=None):
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        ShoppingCartTotal.objects.remove_recipe(instance.id)
+        AuthorStats.objects.change_counters(instance.author_id,
+                                            recipes_count=-1)
+        instance.delete()
+
+    def toggle_recipe(self, request, pk, model, added_error, missing_error):
         user = request.user
-        if not Recipe.objects.filter(pk=pk).exists():
-            if request.method == 'DELETE':
-                return Response(status=status.HTTP_404_NOT_FOUND)
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        recipe = get_object_or_404(Recipe, pk=pk)
+        recipe_id = to_id(pk)
         if request.method == 'POST':
-            serializer = RecipeBaseSerializer(recipe)
-            if serializer.is_valid:
-                is_favorited = Favorite.objects.filter(user=user,
-                                                       recipe=recipe).exists()
-                if is_favorited:
-                    return Response({"errors":
-                                     "Рецепт уже добавлен в избранное"},
-                                    status=status.HTTP_400_BAD_REQUEST)
-                Favorite.objects.create(user=user, recipe=recipe)
+            recipe = recipe_id and model.objects.add(user.id, recipe_id)
+            if recipe:
+                serializer = RecipeBaseSerializer(recipe)
                 return Response(serializer.data,
                                 status=status.HTTP_201_CREATED)
-            return Response(serializer.errors,
-                            status=status.HTTP_400_BAD_REQUEST)
-        if request.method == 'DELETE':
-            deleted = Favorite.objects.filter(user=user,
-                                              recipe=recipe).delete()
-            if deleted[0] > 0:
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response({"errors": "Рецепт не был добавлен в избранное"},
+            if recipe_id and Recipe.objects.filter(pk=recipe_id).exists():
+                return Response({"errors": added_error},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if recipe_id and model.objects.remove(user.id, recipe_id):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        if recipe_id and Recipe.objects.filter(pk=recipe_id).exists():
+            return Response({"errors": missing_error},
                             status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    def toggle_recipes(self, request, model, added_error, missing_error):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        user = request.user
+        if request.method == 'POST':
+            changed = model.objects.add_many(user.id, recipe_ids)
+            success, error = status.HTTP_201_CREATED, added_error
+        else:
+            changed = model.objects.remove_many(user.id, recipe_ids)
+            success, error = status.HTTP_204_NO_CONTENT, missing_error
+        changed = {recipe.id for recipe in changed}
+        existing = set()
+        if len(changed) < len(recipe_ids):
+            existing = set(Recipe.objects.filter(
+                id__in=set(recipe_ids) - changed
+            ).values_list('id', flat=True))
+        results = []
+        for recipe_id in recipe_ids:
+            if recipe_id in changed:
+                results.append({'id': recipe_id, 'status': success})
+            elif recipe_id in existing:
+                results.append({'id': recipe_id,
+                                'status': status.HTTP_400_BAD_REQUEST,
+                                'errors': error})
+            else:
+                results.append({'id': recipe_id,
+                                'status': status.HTTP_404_NOT_FOUND})
+        return Response(results, status=status.HTTP_200_OK)
+
+    @action(methods=['post', 'delete'],
+            permission_classes=(permissions.IsAuthenticated,), detail=True)
+    def favorite(self, request, pk=None):
+        return self.toggle_recipe(request, pk, Favorite, *FAVORITE_ERRORS)
 
     @action(methods=['post', 'delete'],
             permission_classes=(permissions.IsAuthenticated,), detail=True)
     def shopping_cart(self, request, pk=None):
-        user = request.user
-        if not Recipe.objects.filter(pk=pk).exists():
-            if request.method == 'DELETE':
-                return Response(status=status.HTTP_404_NOT_FOUND)
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        recipe = get_object_or_404(Recipe, pk=pk)
-        if request.method == 'POST':
-            serializer = RecipeBaseSerializer(recipe)
-            if serializer.is_valid:
-                is_in_shopping_cart = ShoppingCart.objects.filter(
-                    user=user, recipe=recipe).exists()
-                if is_in_shopping_cart:
-                    return Response({"errors":
-                                     "Рецепт уже добавлен в список покупок"},
-                                    status=status.HTTP_400_BAD_REQUEST)
-                ShoppingCart.objects.create(user=user, recipe=recipe)
-                return Response(serializer.data,
-                                status=status.HTTP_201_CREATED)
-            return Response(serializer.errors,
+        return self.toggle_recipe(request, pk, ShoppingCart,
+                                  *SHOPPING_CART_ERRORS)
+
+    @action(methods=['post', 'delete'],
+            permission_classes=(permissions.IsAuthenticated,), detail=False,
+            url_path='favorite', url_name='favorite-batch')
+    def favorite_batch(self, request):
+        return self.toggle_recipes(request, Favorite, *FAVORITE_ERRORS)
+
+    @action(methods=['post', 'delete'],
+            permission_classes=(permissions.IsAuthenticated,), detail=False,
+            url_path='shopping_cart', url_name='shopping-cart-batch')
+    def shopping_cart_batch(self, request):
+        return self.toggle_recipes(request, ShoppingCart,
+                                   *SHOPPING_CART_ERRORS)
+
+    @action(methods=['get'], detail=False)
+    def by_ingredients(self, request):
+        ingredient_ids = {
+            to_id(value.strip())
+            for param in request.query_params.getlist('ingredients')
+            for value in param.split(',')
+        } & catalog.get_ingredients().keys()
+        if not ingredient_ids:
+            return Response({"errors": "Укажите хотя бы один ингредиент"},
                             status=status.HTTP_400_BAD_REQUEST)
-        if request.method == 'DELETE':
-            deleted = ShoppingCart.objects.filter(user=user,
-                                                  recipe=recipe).delete()
-            if deleted[0] > 0:
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response({"errors": "Рецепт отсутствует в списке покупок"},
+        sort = request.query_params.get('sort', 'missing')
+        if sort not in matching.SORTS:
+            return Response({"errors": "Неизвестный порядок сортировки"},
                             status=status.HTTP_400_BAD_REQUEST)
+        limit = get_limit(request, MATCH_LIMIT, MAX_MATCH_LIMIT)
+        while True:
+            ranked = matching.rank(ingredient_ids, limit, sort)
+            recipes = Recipe.objects.only(
+                *RecipeBaseSerializer.Meta.fields, 'ingredient_ids'
+            ).in_bulk(ranked)
+            deleted = set(ranked) - recipes.keys()
+            if not deleted:
+                break
+            matching.discard(deleted)
+        context = self.get_serializer_context()
+        context['ingredients'] = ingredient_ids
+        serializer = RecipeMatchSerializer(
+            [recipes[pk] for pk in ranked], many=True, context=context)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=['get'], detail=True)
+    def similar(self, request, pk=None):
+        recipe = get_object_or_404(Recipe, pk=to_id(pk))
+        limit = get_limit(request, SIMILAR_LIMIT, MAX_SIMILAR_LIMIT)
+        neighbours = SimilarRecipe.objects.filter(
+            recipe=recipe).select_related('similar').order_by(
+            '-score', 'similar_id')[:limit]
+        serializer = RecipeBaseSerializer(
+            [neighbour.similar for neighbour in neighbours], many=True,
+            context=self.get_serializer_context())
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(methods=['get'],
             permission_classes=(permissions.IsAuthenticated,), detail=False)
     def download_shopping_cart(self, request):
         user = request.user
+        file_type = request.query_params.get('type', 'txt')
+        if file_type not in RENDERERS:
+            return Response({"errors": "Неизвестный формат файла"},
+                            status=status.HTTP_400_BAD_REQUEST)
         if not ShoppingCart.objects.filter(user=user).exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
         ingredients = (
-            IngredientRecipe.objects.filter(
-                recipe__shoprecipe__user_id=request.user.id
-            )
+            ShoppingCartTotal.objects.filter(user=user)
             .values('ingredient__name', 'ingredient__measurement_unit')
             .annotate(total=Sum('amount'))
+            .order_by('ingredient__name', 'ingredient__measurement_unit')
         )
-        download_list = (
-            'Список покупок:\n'
-        )
-        download_list += '\n'.join([
-            f'\u22C5 {ingredient["ingredient__name"]}, '
-            f'({ingredient["ingredient__measurement_unit"]}) '
-            f'----- {ingredient["total"]}'
-            for ingredient in ingredients
-        ])
-
-        download_list += '\n\n Foodgram copyright by sonneee'
-        download_list += '\n\n Github: https://github.com/sonneee/'
-
-        file = f'{user.id}_download.txt'
-        response = HttpResponse(download_list, content_type='text/plain')
+        render, content_type = RENDERERS[file_type]
+        file = f'{user.id}_download.{file_type}'
+        response = StreamingHttpResponse(
+            render(ingredients.iterator()), content_type=content_type)
         response['Content-Disposition'] = f'attachment; filename={file}'
 
         return response
 
+    @action(methods=['get'],
+            permission_classes=(permissions.IsAuthenticated,), detail=False)
+    def shopping_cart_totals(self, request):
+        totals = ShoppingCartTotal.objects.filter(
+            user=request.user).select_related('ingredient').order_by(
+            'ingredient__name')
+        serializer = ShoppingCartTotalSerializer(totals, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 
 class IngredientViewSet(viewsets.ModelViewSet):
     pagination_class = None
@@ -258,9 +501,49 @@ class IngredientViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend, SearchFilter)
     search_fields = ('name',)
 
+    def get_list_validators(self, request):
+        return make_etag('ingredients',
+                         catalog.get_version('ingredients')), None
+
+    @conditional_get('get_list_validators')
+    def list(self, request, *args, **kwargs):
+        if 'search' in request.query_params:
+            return super().list(request, *args, **kwargs)
+        name = request.query_params.get('name', '')
+        ingredients = [ingredient for ingredient
+                       in catalog.get_ingredients().values()
+                       if ingredient.name.startswith(name)]
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(methods=['get'], detail=False)
+    def autocomplete(self, request):
+        name = request.query_params.get('name', '')
+        limit = get_limit(request, AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT)
+        if not name:
+            return Response([], status=status.HTTP_200_OK)
+        ingredients = list(Ingredient.objects.filter(
+            name__istartswith=name).order_by('name')[:limit])
+        if len(ingredients) < limit:
+            ingredients += Ingredient.objects.filter(
+                name__icontains=name).exclude(
+                name__istartswith=name).order_by('name')[
+                :limit - len(ingredients)]
+        serializer = IngredientSerializer(ingredients, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 
 class TagViewSet(viewsets.ModelViewSet):
     pagination_class = None
     http_method_names = ['get', ]
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
+
+    def get_list_validators(self, request):
+        return make_etag('tags', catalog.get_version('tags')), None
+
+    @conditional_get('get_list_validators')
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(catalog.get_tags().values(),
+                                         many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
@@ -1,7 +1,12 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Exists, F, FloatField, OuterRef
+from django.db.models.functions import Cast
 from django_filters.rest_framework import filters, FilterSet
+from rest_framework.filters import OrderingFilter
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes import catalog
+from recipes.models import SEARCH_CONFIG, Ingredient, Recipe
 
 User = get_user_model()
 
@@ -14,19 +19,46 @@ class IngredientFilter(FilterSet):
         fields = ['name']
 
 
+class RecipeOrderingFilter(OrderingFilter):
+
+    def get_ordering(self, request, queryset, view):
+        if (self.ordering_param not in request.query_params
+                and 'rank' in queryset.query.annotations):
+            return ['-rank', *view.ordering]
+        ordering = list(super().get_ordering(request, queryset, view))
+        used = {field.lstrip('-') for field in ordering}
+        return ordering + [field for field in view.ordering
+                           if field.lstrip('-') not in used]
+
+
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=catalog.get_tag_choices,
+        method='tags_filter',
     )
+    search = filters.CharFilter(method='search_filter')
     is_favorited = filters.BooleanFilter(method='is_favorited_filter')
     is_in_shopping_cart = filters.BooleanFilter(
         method='is_in_shopping_cart_filter')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'search', 'is_favorited',
+                  'is_in_shopping_cart')
+
+    def tags_filter(self, queryset, name, value):
+        if not value:
+            return queryset
+        tag_ids = [tag.id for tag in catalog.get_tags().values()
+                   if tag.slug in value]
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag_id__in=tag_ids)))
+
+    def search_filter(self, queryset, name, value):
+        query = SearchQuery(value, config=SEARCH_CONFIG,
+                            search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField()))
 
     def is_favorited_filter(self, queryset, name, value):
         user = self.request.user
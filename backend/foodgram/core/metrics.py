@@ -0,0 +1,89 @@
+import threading
+from bisect import bisect_left
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_lock = threading.Lock()
+_views = {}
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {total}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {total}'
+
+
+class ViewMetrics:
+
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_duration = 0.0
+        self.serialize_duration = 0.0
+        self.render_duration = 0.0
+        self.response_bytes = 0
+
+
+def observe(view, method, duration, queries, db_duration,
+            serialize_duration, render_duration, response_bytes):
+    with _lock:
+        metrics = _views.get((view, method))
+        if metrics is None:
+            metrics = _views[(view, method)] = ViewMetrics()
+        metrics.duration.observe(duration)
+        metrics.queries.observe(queries)
+        metrics.db_duration += db_duration
+        metrics.serialize_duration += serialize_duration
+        metrics.render_duration += render_duration
+        metrics.response_bytes += response_bytes
+
+
+def render():
+    histograms = (
+        ('foodgram_request_duration_seconds', 'duration',
+         'Time spent handling the request'),
+        ('foodgram_request_db_queries', 'queries',
+         'SQL queries run per request'),
+    )
+    counters = (
+        ('foodgram_request_db_duration_seconds_total', 'db_duration',
+         'Time spent in SQL queries'),
+        ('foodgram_request_serialize_duration_seconds_total',
+         'serialize_duration',
+         'Time spent in serializers, including the queries they run'),
+        ('foodgram_request_render_duration_seconds_total', 'render_duration',
+         'Time spent rendering serialized data into response bodies'),
+        ('foodgram_response_bytes_total', 'response_bytes',
+         'Size of response bodies'),
+    )
+    lines = []
+    with _lock:
+        views = sorted(_views.items())
+        for name, field, description in histograms:
+            lines += [f'# HELP {name} {description}',
+                      f'# TYPE {name} histogram']
+            for (view, method), metrics in views:
+                lines.extend(getattr(metrics, field).lines(
+                    name, f'view="{view}",method="{method}"'))
+        for name, field, description in counters:
+            lines += [f'# HELP {name} {description}',
+                      f'# TYPE {name} counter']
+            lines += [f'{name}{{view="{view}",method="{method}"}} '
+                      f'{getattr(metrics, field)}'
+                      for (view, method), metrics in views]
+    return '\n'.join(lines) + '\n'
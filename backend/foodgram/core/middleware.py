@@ -0,0 +1,101 @@
+import heapq
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+_current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+
+    def __init__(self, keep_queries):
+        self.keep_queries = keep_queries
+        self.count = 0
+        self.duration = 0.0
+        self.queries = []
+        self.serialize_duration = 0.0
+        self.render_duration = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if self.keep_queries:
+                self.queries.append((elapsed, sql))
+
+
+@contextmanager
+def serializing():
+    profile = _current.get()
+    if profile is None or profile.serializing:
+        yield
+        return
+    profile.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serialize_duration += time.perf_counter() - started
+        profile.serializing = False
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow = settings.SLOW_REQUEST_SECONDS
+        profile = request._profile = RequestProfile(bool(slow))
+        token = _current.set(profile)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(profile):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        if response.streaming:
+            size = int(response.get('Content-Length', 0))
+        else:
+            size = len(response.content)
+        method = request.method if request.method in METHODS else 'other'
+        metrics.observe(view, method, duration, profile.count,
+                        profile.duration, profile.serialize_duration,
+                        profile.render_duration, size)
+        if slow and duration >= slow:
+            top = heapq.nlargest(settings.SLOW_REQUEST_TOP_QUERIES,
+                                 profile.queries, key=lambda query: query[0])
+            logger.warning(
+                'Slow request %s %s (%s): %.3f s, %s queries in %.3f s%s',
+                request.method, request.get_full_path(), view, duration,
+                profile.count, profile.duration,
+                ''.join('\n%.3f s %s' % query for query in top))
+        return response
+
+    def process_template_response(self, request, response):
+        profile = request._profile
+        started = time.perf_counter()
+
+        def rendered(response):
+            profile.render_duration += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,8 @@
+from .middleware import serializing
+
+
+class ProfiledSerializerMixin:
+
+    def to_representation(self, instance):
+        with serializing():
+            return super().to_representation(instance)
@@ -1,4 +1,8 @@
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as request_metrics
 
 
 def page_not_found(request, exception):
@@ -6,3 +10,13 @@ def page_not_found(request, exception):
   <p>Страницы %s не существует, попробуйте позднее</p>
     </html>''' % request.path
     return HttpResponse(html)
+
+
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    authorized = token and constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(request_metrics.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import (Favorite, Follow, Ingredient,
+from .models import (AuthorStats, Favorite, Follow, Ingredient,
                      IngredientRecipe, Recipe,
                      ShoppingCart, Tag, User)
 
@@ -20,13 +20,17 @@ class IngredientRecipeInline(admin.StackedInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author_username', 'favorited_count')
+    list_display = ('name', 'author_username', 'favorited_count',
+                    'in_carts_count')
     list_filter = ('author', 'name', 'tags')
+    list_select_related = ('author',)
     inlines = (IngredientRecipeInline,)
     exclude = ('ingredients',)
 
+    @admin.display(description='В избранном',
+                   ordering='favorites_count')
     def favorited_count(self, obj):
-        return Favorite.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
     def author_username(self, obj):
         return obj.author.username
@@ -44,3 +48,9 @@ admin.site.register(IngredientRecipe)
 admin.site.register(Follow)
 admin.site.register(Favorite)
 admin.site.register(ShoppingCart)
+
+
+@admin.register(AuthorStats)
+class AuthorStatsAdmin(admin.ModelAdmin):
+    list_display = ('author', 'recipes_count', 'followers_count')
+    list_select_related = ('author',)
@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Ingredient, Tag
+
+VERSION_KEY = 'catalog:{}:version'
+
+_loaded = {}
+
+
+def get_version(name):
+    versions = caches['versions']
+    key = VERSION_KEY.format(name)
+    version = versions.get(key)
+    if version is None:
+        versions.add(key, time.time_ns(), None)
+        version = versions.get(key)
+    return version
+
+
+def bump_version(name):
+    try:
+        caches['versions'].incr(VERSION_KEY.format(name))
+    except ValueError:
+        get_version(name)
+
+
+def load(name, queryset):
+    version = get_version(name)
+    loaded = _loaded.get(name)
+    if (loaded is None or loaded[0] != version
+            or time.monotonic() - loaded[1] > settings.CATALOG_CACHE_TTL):
+        loaded = (version, time.monotonic(),
+                  {obj.id: obj for obj in queryset})
+        _loaded[name] = loaded
+    return loaded[2]
+
+
+def get_tags():
+    return load('tags', Tag.objects.order_by('id'))
+
+
+def get_ingredients():
+    return load('ingredients', Ingredient.objects.order_by('id'))
+
+
+def get_tag_choices():
+    return [(tag.slug, tag.name) for tag in get_tags().values()]
@@ -0,0 +1,94 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import catalog
+from .models import Recipe
+
+RENDITIONS = {
+    'small': 320,
+    'medium': 960,
+    'large': 1920,
+}
+RENDITIONS_DIR = 'recipes/renditions'
+RENDITION_QUALITY = 80
+ORIGINAL_QUALITY = 95
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp')
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS,
+                               thread_name_prefix='renditions')
+
+
+def render(image, size):
+    image = image.copy()
+    image.thumbnail((size, size))
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=RENDITION_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def strip_metadata(file, make_file=BytesIO):
+    with Image.open(file) as image:
+        if (getattr(image, 'is_animated', False)
+                or not any(key in image.info for key in METADATA_KEYS)):
+            file.seek(0)
+            return file
+        stripped = make_file()
+        ImageOps.exif_transpose(image).save(
+            stripped, image.format, exif=b'',
+            icc_profile=image.info.get('icc_profile'),
+            quality=ORIGINAL_QUALITY)
+    file.close()
+    stripped.seek(0)
+    return stripped
+
+
+def build_renditions(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', 'image_renditions').first()
+    if recipe is None or not recipe.image:
+        return
+    with recipe.image.open('rb') as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+        renditions = {
+            name: default_storage.save(
+                f'{RENDITIONS_DIR}/{stem}_{name}.webp', render(image, size))
+            for name, size in RENDITIONS.items()
+        }
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(image_renditions=renditions, updated_at=timezone.now())
+    if updated:
+        catalog.bump_version('recipes')
+    stale = renditions.values() if not updated else (
+        set(recipe.image_renditions.values()) - set(renditions.values()))
+    for path in stale:
+        default_storage.delete(path)
+
+
+def run(recipe_id, stale=()):
+    try:
+        for path in stale:
+            default_storage.delete(path)
+        build_renditions(recipe_id)
+    except Exception:
+        logger.exception('Failed to build renditions for recipe %s',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_renditions(recipe_id, stale=()):
+    _executor.submit(run, recipe_id, stale)
@@ -1,59 +1,95 @@
 import csv
+import json
 import os
+from itertools import islice
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
+from recipes import catalog
 from recipes.models import Ingredient, Tag
 from foodgram import settings
 
+BATCH_SIZE = 1000
+INGREDIENTS_JSON = os.path.join(os.path.dirname(os.path.dirname(
+    settings.BASE_DIR)), 'data', 'ingredients.json')
 
-def create_ingridient(name, measure):
-    Ingredient.objects.get_or_create(
-        name=name,
-        measurement_unit=measure
-    )
 
+def read_csv(path, fields):
+    with open(path, 'r', encoding='utf-8') as table:
+        for row in csv.reader(table):
+            yield dict(zip(fields, (value.strip() for value in row)))
 
-def create_tag(name, color, slug):
-    Tag.objects.get_or_create(
-        name=name,
-        color=color,
-        slug=slug
-    )
+
+def read_json(path, fields):
+    with open(path, 'r', encoding='utf-8') as file:
+        for row in json.load(file):
+            yield {field: row[field].strip() for field in fields}
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 class Command(BaseCommand):
-    help = 'Load ingredients.csv to db'
+    help = 'Load ingredients and tags to db'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count new rows without saving them')
+        parser.add_argument('--json', default=INGREDIENTS_JSON,
+                            help='Path to ingredients.json')
 
     def handle(self, *args, **options):
-        path_ingr = os.path.join(settings.BASE_DIR, 'ingredients.csv')
-        path_tags = os.path.join(settings.BASE_DIR, 'tags.csv')
-        try:
-            table = open(path_ingr, 'r', encoding='utf-8')
-        except FileNotFoundError:
-            self.stdout.write(
-                self.style.WARNING('No file ingredients.csv provided'))
-        else:
-            with table:
-                counter = 0
-                reader = csv.reader(table)
-                for name, measure in reader:
-                    create_ingridient(name, measure)
-                    counter += 1
-            self.stdout.write(
-                self.style.SUCCESS('%s ingridients loaded to db' % counter)
-            )
-        try:
-            table = open(path_tags, 'r', encoding='utf-8')
-        except FileNotFoundError:
-            self.stdout.write(self.style.WARNING('No file tags.csv provided'))
-        else:
-            with table:
-                counter = 0
-                reader = csv.reader(table)
-                for name, color, slug in reader:
-                    create_tag(name, color, slug)
-                    counter += 1
-            self.stdout.write(
-                self.style.SUCCESS('%s tags loaded to db' % counter)
-            )
+        sources = (
+            ('ingredients', Ingredient, ('name', 'measurement_unit'),
+             os.path.join(settings.BASE_DIR, 'ingredients.csv'), read_csv),
+            ('ingredients', Ingredient, ('name', 'measurement_unit'),
+             options['json'], read_json),
+            ('tags', Tag, ('name', 'color', 'slug'),
+             os.path.join(settings.BASE_DIR, 'tags.csv'), read_csv),
+        )
+        with transaction.atomic():
+            for name, model, fields, path, reader in sources:
+                if not os.path.exists(path):
+                    self.stdout.write(self.style.WARNING(
+                        'No file %s provided' % os.path.basename(path)))
+                    continue
+                counter = self.load(model, reader(path, fields),
+                                    fields[-1:] if model is Tag else fields,
+                                    options['batch_size'],
+                                    options['dry_run'])
+                self.stdout.write(self.style.SUCCESS(
+                    '%s %s from %s %s to db' % (
+                        counter, name, os.path.basename(path),
+                        'would be loaded' if options['dry_run']
+                        else 'loaded')))
+                if not options['dry_run']:
+                    transaction.on_commit(
+                        lambda name=name: catalog.bump_version(name))
+
+    def load(self, model, rows, key_fields, batch_size, dry_run):
+        existing = set(model.objects.values_list(*key_fields))
+        counter = 0
+        processed = 0
+        for chunk in chunked(rows, batch_size):
+            objects = []
+            for row in chunk:
+                key = tuple(row[field] for field in key_fields)
+                if key in existing:
+                    continue
+                existing.add(key)
+                objects.append(model(**row))
+            if objects and not dry_run:
+                model.objects.bulk_create(objects, ignore_conflicts=True)
+            counter += len(objects)
+            processed += len(chunk)
+            self.stdout.write('%s: %s rows processed, %s new' % (
+                model._meta.verbose_name_plural, processed, counter))
+        return counter
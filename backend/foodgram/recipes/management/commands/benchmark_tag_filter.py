@@ -0,0 +1,61 @@
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+
+from core.filters import RecipeFilter
+from recipes import catalog
+from recipes.management.dataset import MIN_RECIPES, Rollback, seed
+from recipes.models import Recipe
+
+PAGE_SIZE = 6
+
+
+class Command(BaseCommand):
+    help = ('Compare the tag filter against the old join with DISTINCT '
+            'for 1, 3 and all selected tags')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed N recipes in a rolled back '
+                                 'transaction before measuring')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if 0 < options['seed'] < MIN_RECIPES:
+            raise CommandError('--seed must be 0 or at least %d'
+                               % MIN_RECIPES)
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    seed(options['seed'])
+                    catalog.bump_version('tags')
+                self.benchmark(options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def benchmark(self, repeat):
+        slugs = [tag.slug for tag in catalog.get_tags().values()]
+        factory = RequestFactory()
+        for count in sorted({1, min(3, len(slugs)), len(slugs)}):
+            selected = slugs[:count]
+            request = factory.get('/api/recipes/', {'tags': selected})
+            request.user = None
+            queries = {
+                'join': Recipe.objects.filter(
+                    tags__slug__in=selected).distinct(),
+                'exists': RecipeFilter(request.GET, Recipe.objects.all(),
+                                       request=request).qs,
+            }
+            for name, queryset in queries.items():
+                timings = []
+                for _ in range(repeat):
+                    started = perf_counter()
+                    list(queryset.all()[:PAGE_SIZE])
+                    timings.append((perf_counter() - started) * 1000)
+                self.stdout.write('%d tags, %s: median %.2f ms, max %.2f ms'
+                                  % (count, name, median(timings),
+                                     max(timings)))
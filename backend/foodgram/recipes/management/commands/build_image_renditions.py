@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import build_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Build resized recipe images missed by the background workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Rebuild renditions for every recipe')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_renditions={})
+        counter = 0
+        for recipe_id in recipes.values_list('id', flat=True).iterator():
+            build_renditions(recipe_id)
+            counter += 1
+        self.stdout.write(
+            self.style.SUCCESS('%s recipe images processed' % counter))
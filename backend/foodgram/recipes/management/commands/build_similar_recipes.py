@@ -0,0 +1,90 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from recipes.models import Recipe, SimilarRecipe
+from recipes.similarity import RecipeVectors, top_neighbours
+
+CHUNK_SIZE = 100
+NEIGHBOURS = 20
+
+
+class Command(BaseCommand):
+    help = ('Store the nearest recipes by ingredients and tags, '
+            'only for recipes changed since the last run unless --full')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute neighbours of every recipe')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--neighbours', type=int, default=NEIGHBOURS)
+
+    def handle(self, *args, **options):
+        computed_at = timezone.now()
+        last_run = SimilarRecipe.objects.aggregate(
+            last=Max('computed_at'))['last']
+        full = options['full'] or last_run is None
+        vectors = RecipeVectors.load()
+        if full:
+            rows = np.arange(len(vectors.recipe_ids))
+        else:
+            rows = vectors.rows(list(Recipe.objects.filter(
+                updated_at__gte=last_run).values_list('id', flat=True)))
+        changed = vectors.recipe_ids[rows].tolist()
+        chunk_size = options['chunk_size']
+        limit = options['neighbours']
+        affected = set()
+        with transaction.atomic():
+            if full:
+                SimilarRecipe.objects.all().delete()
+            else:
+                SimilarRecipe.objects.filter(
+                    Q(recipe_id__in=changed) | Q(similar_id__in=changed)
+                ).delete()
+                floor = self.get_floor(vectors, rows)
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                product = vectors.similarities(chunk)
+                positions, columns, scores = top_neighbours(product, limit)
+                SimilarRecipe.objects.store(
+                    vectors.recipe_ids[chunk[positions]].tolist(),
+                    vectors.recipe_ids[columns].tolist(),
+                    scores.tolist(), computed_at)
+                if not full:
+                    affected.update(self.store_reverse(
+                        vectors, chunk, product, floor, limit, computed_at))
+                self.stdout.write('%s/%s recipes compared' % (
+                    start + len(chunk), len(rows)))
+            if affected:
+                SimilarRecipe.objects.trim(list(affected), limit)
+        self.stdout.write(self.style.SUCCESS(
+            '%s recipes updated, %s neighbour lists amended' % (
+                len(changed), len(affected))))
+
+    def get_floor(self, vectors, rows):
+        changed = np.zeros(len(vectors.recipe_ids), dtype=bool)
+        changed[rows] = True
+        counts = np.zeros(len(vectors.recipe_ids), dtype=np.int64)
+        lowest = np.zeros(len(vectors.recipe_ids))
+        stored = SimilarRecipe.objects.order_by().values(
+            'recipe_id').annotate(total=Count('id'), lowest=Min('score'))
+        for row in stored.iterator():
+            position = np.searchsorted(vectors.recipe_ids, row['recipe_id'])
+            counts[position] = row['total']
+            lowest[position] = row['lowest']
+        return changed, counts, lowest
+
+    def store_reverse(self, vectors, chunk, product, floor, limit,
+                      computed_at):
+        changed, counts, lowest = floor
+        product = product.tocoo()
+        columns, scores = product.col, product.data
+        keep = ~changed[columns] & (
+            (counts[columns] < limit) | (scores > lowest[columns]))
+        recipe_ids = vectors.recipe_ids[columns[keep]].tolist()
+        SimilarRecipe.objects.store(
+            recipe_ids, vectors.recipe_ids[chunk[product.row[keep]]].tolist(),
+            scores[keep].tolist(), computed_at)
+        return recipe_ids
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes import catalog
+from recipes.management import plans
+from recipes.management.dataset import MIN_RECIPES, Rollback, seed
+
+SEED_RECIPES = 20000
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway dataset and check that hot queries '
+            'use indexes instead of sequential scans')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=SEED_RECIPES)
+        parser.add_argument('--verbose-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['recipes'] < MIN_RECIPES:
+            raise CommandError('--recipes must be at least %d' % MIN_RECIPES)
+        try:
+            with transaction.atomic():
+                failures = self.check_plans(options)
+                raise Rollback
+        except Rollback:
+            pass
+        if failures:
+            raise CommandError('Sequential scans in: %s'
+                               % ', '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All query plans use indexes'))
+
+    def check_plans(self, options):
+        user, author, recipe = seed(options['recipes'])
+        catalog.bump_version('tags')
+        failures = []
+        for name, queryset in plans.hot_queries(user, author, recipe).items():
+            plan = plans.explain(queryset)
+            tables = plans.seq_scans(plan)
+            if options['verbose_plans']:
+                self.stdout.write(str(plan))
+            if tables:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(
+                    '%s: sequential scan on %s' % (name, ', '.join(tables))))
+            else:
+                self.stdout.write('%s: ok' % name)
+        return failures
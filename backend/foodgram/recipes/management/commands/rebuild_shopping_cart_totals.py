@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import ShoppingCartTotal
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify shopping cart totals against shopping carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare totals, do not rebuild')
+
+    def handle(self, *args, **options):
+        live = {(row['user_id'], row['ingredient_id']): row['amount']
+                for row in ShoppingCartTotal.objects.live().iterator()}
+        if options['check']:
+            stored = {
+                (row['user_id'], row['ingredient_id']): row['amount']
+                for row in ShoppingCartTotal.objects.values(
+                    'user_id', 'ingredient_id', 'amount').iterator()
+            }
+            mismatched = [key for key in live.keys() | stored.keys()
+                          if live.get(key) != stored.get(key)]
+            if mismatched:
+                raise CommandError(
+                    '%s shopping cart totals differ from carts'
+                    % len(mismatched))
+            self.stdout.write(
+                self.style.SUCCESS('%s shopping cart totals are consistent'
+                                   % len(stored)))
+            return
+        with transaction.atomic():
+            ShoppingCartTotal.objects.all().delete()
+            ShoppingCartTotal.objects.bulk_create(
+                (ShoppingCartTotal(user_id=user_id,
+                                   ingredient_id=ingredient_id,
+                                   amount=amount)
+                 for (user_id, ingredient_id), amount in live.items()),
+                batch_size=BATCH_SIZE)
+        self.stdout.write(
+            self.style.SUCCESS('%s shopping cart totals rebuilt' % len(live)))
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import AuthorStats, Favorite, Follow, Recipe, ShoppingCart
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def count_of(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('*')).values('total')), 0)
+
+
+class Command(BaseCommand):
+    help = 'Recount or verify recipe and author popularity counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare counters, do not fix them')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.annotate(
+            live_favorites=count_of(Favorite.objects, 'recipe'),
+            live_carts=count_of(ShoppingCart.objects, 'recipe'),
+        ).values_list('id', 'favorites_count', 'in_carts_count',
+                      'live_favorites', 'live_carts')
+        stale_recipes = [
+            Recipe(id=pk, favorites_count=favorites, in_carts_count=carts)
+            for pk, stored_favorites, stored_carts, favorites, carts
+            in recipes.iterator()
+            if (stored_favorites, stored_carts) != (favorites, carts)]
+        authors = User.objects.annotate(
+            stored_recipes=Coalesce('stats__recipes_count', 0),
+            stored_followers=Coalesce('stats__followers_count', 0),
+            live_recipes=count_of(Recipe.objects, 'author'),
+            live_followers=count_of(Follow.objects, 'author'),
+        ).values_list('id', 'stored_recipes', 'stored_followers',
+                      'live_recipes', 'live_followers')
+        stale_authors = [
+            AuthorStats(author_id=pk, recipes_count=recipes_count,
+                        followers_count=followers)
+            for pk, stored_recipes, stored_followers, recipes_count, followers
+            in authors.iterator()
+            if (stored_recipes, stored_followers) != (recipes_count,
+                                                      followers)]
+        if options['check']:
+            if stale_recipes or stale_authors:
+                raise CommandError(
+                    '%s recipe and %s author counters are stale'
+                    % (len(stale_recipes), len(stale_authors)))
+            self.stdout.write(self.style.SUCCESS('Counters are consistent'))
+            return
+        with transaction.atomic():
+            Recipe.objects.bulk_update(
+                stale_recipes, ('favorites_count', 'in_carts_count'),
+                batch_size=BATCH_SIZE)
+            AuthorStats.objects.filter(author_id__in=[
+                stats.author_id for stats in stale_authors]).delete()
+            AuthorStats.objects.bulk_create(stale_authors,
+                                            batch_size=BATCH_SIZE)
+        self.stdout.write(self.style.SUCCESS(
+            '%s recipe and %s author counters fixed'
+            % (len(stale_recipes), len(stale_authors))))
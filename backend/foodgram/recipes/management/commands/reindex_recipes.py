@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from recipes import catalog
+from recipes.models import Recipe
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Rebuild recipe full-text search vectors in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--missing', action='store_true',
+                            help='Only index recipes without a vector')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by('id')
+        if options['missing']:
+            recipes = recipes.filter(search_vector__isnull=True)
+        total = recipes.count()
+        done = 0
+        last_id = 0
+        while True:
+            ids = list(recipes.filter(id__gt=last_id).values_list(
+                'id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            done += Recipe.objects.filter(
+                id__in=ids).refresh_search_index()
+            last_id = ids[-1]
+            self.stdout.write('%s/%s recipes indexed' % (done, total))
+        catalog.bump_version('recipes')
+        self.stdout.write(
+            self.style.SUCCESS('%s recipes indexed' % done))
@@ -0,0 +1,77 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from recipes.models import (Favorite, Follow, Ingredient, IngredientRecipe,
+                            Recipe, ShoppingCart, ShoppingCartTotal, Tag)
+
+User = get_user_model()
+
+RECIPES_PER_AUTHOR = 20
+MIN_RECIPES = RECIPES_PER_AUTHOR
+INGREDIENTS_PER_RECIPE = 6
+TAGS_PER_RECIPE = 3
+FOLLOWS_PER_AUTHOR = 20
+BATCH_SIZE = 5000
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(total):
+    authors = User.objects.bulk_create(
+        User(username=f'plan_author_{number}',
+             email=f'plan_author_{number}@example.com')
+        for number in range(total // RECIPES_PER_AUTHOR + 1))
+    user = authors[0]
+    tags = Tag.objects.bulk_create(
+        Tag(name=f'plan_tag_{number}', slug=f'plan-tag-{number}')
+        for number in range(10))
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'plan_ingredient_{number}',
+                   measurement_unit='г')
+        for number in range(1000))
+    recipes = Recipe.objects.bulk_create(
+        (Recipe(name=f'plan_recipe_{number}', text='plan',
+                cooking_time=1,
+                author=authors[number % len(authors)])
+         for number in range(total)), batch_size=BATCH_SIZE)
+    IngredientRecipe.objects.bulk_create(
+        (IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+         for recipe in recipes
+         for ingredient in random.sample(ingredients,
+                                         INGREDIENTS_PER_RECIPE)),
+        batch_size=BATCH_SIZE)
+    Recipe.tags.through.objects.bulk_create(
+        (Recipe.tags.through(recipe=recipe, tag=tag)
+         for recipe in recipes
+         for tag in random.sample(tags, random.randint(1, TAGS_PER_RECIPE))),
+        batch_size=BATCH_SIZE)
+    for model in (Favorite, ShoppingCart):
+        model.objects.bulk_create(
+            model(user=author, recipe=recipe)
+            for author in authors
+            for recipe in random.sample(recipes, min(5, len(recipes))))
+    Follow.objects.bulk_create(
+        Follow(user=user, author=author) for author in authors[1:50])
+    Follow.objects.bulk_create(
+        (Follow(user=follower, author=author)
+         for follower in authors[1:]
+         for author in random.sample(
+             authors, min(FOLLOWS_PER_AUTHOR, len(authors)))
+         if author != follower),
+        batch_size=BATCH_SIZE)
+    ShoppingCartTotal.objects.bulk_create(
+        ShoppingCartTotal(user=author, ingredient=ingredient, amount=1)
+        for author in authors
+        for ingredient in random.sample(ingredients, 20))
+    Recipe.objects.refresh_search_index()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT gin_clean_pending_list(pg_class.oid) FROM pg_class "
+            "JOIN pg_am ON pg_am.oid = pg_class.relam "
+            "WHERE pg_am.amname = 'gin'")
+        cursor.execute('ANALYZE')
+    return user, authors[1], recipes[0]
@@ -0,0 +1,103 @@
+from urllib.parse import parse_qs, urlparse
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.db.models import Sum
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.views import RecipeViewSet
+from core.pagination import CursorLimitPagination
+from recipes.models import (Favorite, Follow, IngredientRecipe, Recipe,
+                            ShoppingCart, ShoppingCartTotal, Tag)
+
+User = get_user_model()
+
+PAGE_SIZE = 6
+HOT_MODELS = (Recipe, Recipe.tags.through, IngredientRecipe, Favorite,
+              ShoppingCart, ShoppingCartTotal, Follow)
+
+
+def scanned_tables(plan):
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan['Relation Name']
+    for child in plan.get('Plans', ()):
+        yield from scanned_tables(child)
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        return cursor.fetchone()[0][0]['Plan']
+
+
+def seq_scans(plan):
+    hot_tables = {model._meta.db_table for model in HOT_MODELS}
+    return sorted(set(scanned_tables(plan)) & hot_tables)
+
+
+def make_view(user, action, params):
+    request = Request(APIRequestFactory().get('/api/recipes/', params))
+    request.user = user
+    return RecipeViewSet(request=request, args=(), kwargs={},
+                         action=action, format_kwarg=None)
+
+
+def page(view, queryset):
+    if CursorLimitPagination.cursor_query_param in view.request.query_params:
+        paginator = CursorLimitPagination()
+        paginator.page_size = PAGE_SIZE
+        return paginator.get_page_queryset(queryset, view.request, view)
+    return queryset[:PAGE_SIZE]
+
+
+def recipe_list(user, **params):
+    view = make_view(user, 'list', params)
+    return page(view, view.filter_queryset(view.get_queryset()))
+
+
+def feed(user, **params):
+    view = make_view(user, 'feed', params)
+    return page(view, view.get_feed_queryset(user))
+
+
+def encode_position(recipe):
+    paginator = CursorLimitPagination()
+    paginator.base_url = 'http://testserver/api/recipes/'
+    link = paginator.encode_cursor(Cursor(
+        offset=0, reverse=False, position=paginator.get_position(recipe)))
+    return parse_qs(urlparse(link).query)[paginator.cursor_query_param][0]
+
+
+def hot_queries(user, author, recipe):
+    tag = Tag.objects.filter(slug__startswith='plan-tag').first()
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True)[:6])
+    cursor = encode_position(recipe)
+    return {
+        'recipe list': recipe_list(AnonymousUser()),
+        'recipe list flags': recipe_list(user),
+        'recipe list cursor page': recipe_list(
+            AnonymousUser(), cursor=cursor),
+        'popular recipes': recipe_list(
+            AnonymousUser(), ordering='-favorites_count'),
+        'author recipes': recipe_list(AnonymousUser(), author=author.id),
+        'tag filter': recipe_list(AnonymousUser(), tags=tag.slug),
+        'search': recipe_list(AnonymousUser(), search=recipe.name),
+        'favorites filter': recipe_list(user, is_favorited=1),
+        'shopping cart filter': recipe_list(user, is_in_shopping_cart=1),
+        'subscription feed': feed(user),
+        'subscription feed cursor page': feed(user, cursor=cursor),
+        'ingredient amounts': IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids).select_related('ingredient'),
+        'recipe ingredient totals': IngredientRecipe.objects.filter(
+            recipe=recipe).values('ingredient_id').annotate(
+            total=Sum('amount')),
+        'shopping cart totals': ShoppingCartTotal.objects.filter(
+            user=user).select_related('ingredient'),
+        'subscriptions': User.objects.filter(
+            following__user=user).select_related('stats').order_by(
+            'id')[:PAGE_SIZE],
+    }
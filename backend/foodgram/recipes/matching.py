@@ -0,0 +1,107 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+
+from . import catalog
+from .models import Recipe
+
+REFRESH_OVERLAP = timedelta(minutes=1)
+SORTS = ('missing', 'overlap')
+
+_lock = threading.Lock()
+_index = {}
+
+
+class IngredientIndex:
+
+    def __init__(self):
+        self.postings = {}
+        self.recipes = {}
+        self.sizes = np.zeros(0, dtype=np.int32)
+        self.updated_at = None
+        self.version = None
+        self.built_at = time.monotonic()
+
+    def add(self, recipe_id, ingredient_ids):
+        self.discard(recipe_id)
+        self.recipes[recipe_id] = array('q', ingredient_ids)
+        for ingredient_id in ingredient_ids:
+            posting = self.postings.setdefault(ingredient_id, array('q'))
+            if not posting or posting[-1] < recipe_id:
+                posting.append(recipe_id)
+            else:
+                insort(posting, recipe_id)
+        if recipe_id >= len(self.sizes):
+            sizes = np.zeros(max(recipe_id + 1, 2 * len(self.sizes)),
+                             dtype=np.int32)
+            sizes[:len(self.sizes)] = self.sizes
+            self.sizes = sizes
+        self.sizes[recipe_id] = len(ingredient_ids)
+
+    def discard(self, recipe_id):
+        if recipe_id not in self.recipes:
+            return
+        for ingredient_id in self.recipes.pop(recipe_id):
+            posting = self.postings[ingredient_id]
+            position = bisect_left(posting, recipe_id)
+            if position < len(posting) and posting[position] == recipe_id:
+                del posting[position]
+        self.sizes[recipe_id] = 0
+
+    def load(self, version):
+        recipes = Recipe.objects.order_by('id')
+        if self.updated_at is not None:
+            recipes = recipes.filter(
+                updated_at__gte=self.updated_at - REFRESH_OVERLAP)
+        for recipe_id, ingredient_ids, updated_at in recipes.values_list(
+                'id', 'ingredient_ids', 'updated_at').iterator():
+            self.add(recipe_id, ingredient_ids)
+            if self.updated_at is None or updated_at > self.updated_at:
+                self.updated_at = updated_at
+        self.version = version
+
+    def rank(self, ingredient_ids, limit, sort='missing'):
+        postings = [np.frombuffer(self.postings[ingredient_id], np.int64)
+                    for ingredient_id in ingredient_ids
+                    if self.postings.get(ingredient_id)]
+        if not postings:
+            return []
+        counts = np.bincount(np.concatenate(postings))
+        recipe_ids = np.flatnonzero(counts)
+        matched = counts[recipe_ids]
+        missing = self.sizes[recipe_ids] - matched
+        if sort == 'missing':
+            keys = (-recipe_ids, -matched, missing)
+        else:
+            keys = (-recipe_ids, missing, -matched)
+        return recipe_ids[np.lexsort(keys)[:limit]].tolist()
+
+
+def get_index():
+    version = catalog.get_version('recipes')
+    index = _index.get('ingredients')
+    if (index is None or time.monotonic() - index.built_at
+            > settings.RECIPE_MATCH_INDEX_TTL):
+        index = IngredientIndex()
+        _index['ingredients'] = index
+    if index.version != version:
+        index.load(version)
+    return index
+
+
+def rank(ingredient_ids, limit, sort='missing'):
+    with _lock:
+        return get_index().rank(ingredient_ids, limit, sort)
+
+
+def discard(recipe_ids):
+    with _lock:
+        index = _index.get('ingredients')
+        if index is not None:
+            for recipe_id in recipe_ids:
+                index.discard(recipe_id)
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0005_alter_ingredientrecipe_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shoptotals', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shoptotals', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Итог списка покупок',
+                'verbose_name_plural': 'Итоги списков покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcarttotal',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_cart_total'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO recipes_shoppingcarttotal (user_id, ingredient_id, amount)
+                SELECT cart.user_id, ir.ingredient_id, SUM(ir.amount)
+                FROM recipes_ingredientrecipe ir
+                JOIN recipes_shoppingcart cart ON cart.recipe_id = ir.recipe_id
+                GROUP BY cart.user_id, ir.ingredient_id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
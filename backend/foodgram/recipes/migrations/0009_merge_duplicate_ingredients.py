@@ -0,0 +1,42 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:08
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingCartTotal = apps.get_model('recipes', 'ShoppingCartTotal')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        extra_ids = list(Ingredient.objects.filter(
+            name=duplicate['name'],
+            measurement_unit=duplicate['measurement_unit']
+        ).exclude(id=keep_id).values_list('id', flat=True))
+        IngredientRecipe.objects.filter(
+            ingredient_id__in=extra_ids).update(ingredient_id=keep_id)
+        for total in ShoppingCartTotal.objects.filter(
+                ingredient_id__in=extra_ids):
+            kept, _ = ShoppingCartTotal.objects.get_or_create(
+                user_id=total.user_id, ingredient_id=keep_id,
+                defaults={'amount': 0})
+            kept.amount += total.amount
+            kept.save(update_fields=['amount'])
+            total.delete()
+        Ingredient.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_ingredients,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:12
+
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_rows(apps, schema_editor):
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    Tag = apps.get_model('recipes', 'Tag')
+    duplicates = IngredientRecipe.objects.values(
+        'recipe_id', 'ingredient_id'
+    ).annotate(keep_id=Min('id'), amount=Sum('amount'),
+               total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        IngredientRecipe.objects.filter(
+            id=duplicate['keep_id']).update(amount=duplicate['amount'])
+        IngredientRecipe.objects.filter(
+            recipe_id=duplicate['recipe_id'],
+            ingredient_id=duplicate['ingredient_id']
+        ).exclude(id=duplicate['keep_id']).delete()
+    duplicates = Tag.objects.values('slug').annotate(
+        keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        for tag in Tag.objects.filter(slug=duplicate['slug']).exclude(
+                id=duplicate['keep_id']):
+            tag.slug = f'{tag.slug}-{tag.id}'
+            tag.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_feed_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rows,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipes', '0014_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='auth.user', verbose_name='Автор')),
+                ('recipes_count', models.PositiveIntegerField(default=0, verbose_name='Рецептов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunSQL(
+            sql=[
+                """
+                UPDATE recipes_recipe r SET
+                    favorites_count = (SELECT COUNT(*) FROM recipes_favorite f
+                                       WHERE f.recipe_id = r.id),
+                    in_carts_count = (SELECT COUNT(*) FROM recipes_shoppingcart c
+                                      WHERE c.recipe_id = r.id)
+                """,
+                """
+                INSERT INTO recipes_authorstats (author_id, recipes_count, followers_count)
+                SELECT u.id,
+                       (SELECT COUNT(*) FROM recipes_recipe r WHERE r.author_id = u.id),
+                       (SELECT COUNT(*) FROM recipes_follow f WHERE f.author_id = u.id)
+                FROM auth_user u
+                """,
+            ],
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-pub_date', '-id'], name='recipe_popular_idx'),
+        ),
+    ]
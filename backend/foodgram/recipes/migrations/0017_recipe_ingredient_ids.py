@@ -0,0 +1,28 @@
+# Generated by Django 3.2.16 on 2026-10-18 04:40
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_ids',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), blank=True, default=list, editable=False, size=None, verbose_name='Ингредиенты для поиска'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE recipes_recipe r SET ingredient_ids = ARRAY(
+                    SELECT ir.ingredient_id FROM recipes_ingredientrecipe ir
+                    WHERE ir.recipe_id = r.id ORDER BY ir.ingredient_id
+                )
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
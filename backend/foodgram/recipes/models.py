@@ -1,10 +1,18 @@
 from colorfield.fields import ColorField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.aggregates import ArrayAgg, StringAgg
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import connection, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value, Window
+from django.db.models.functions import Cast, Coalesce, Upper
+from django.db.models.functions import RowNumber
 
 MIN_VAL = 1
 MAX_VAL = 10000
+SEARCH_CONFIG = 'russian'
 
 
 User = get_user_model()
@@ -13,7 +21,8 @@ User = get_user_model()
 class Tag(models.Model):
     name = models.CharField(max_length=200, verbose_name='Название')
     color = ColorField(default='#FF0000', verbose_name='Цвет')
-    slug = models.SlugField(max_length=200, verbose_name='Слаг')
+    slug = models.SlugField(max_length=200, unique=True,
+                            verbose_name='Слаг')
 
     class Meta:
         verbose_name = 'Тег'
@@ -31,11 +40,73 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        indexes = [
+            models.Index(fields=('name',), name='ingredient_name_prefix_idx',
+                         opclasses=('varchar_pattern_ops',)),
+            models.Index(
+                OpClass(Upper(Cast('name', models.TextField())),
+                        name='text_pattern_ops'),
+                name='ingredient_iname_prefix_idx'),
+            GinIndex(
+                OpClass(Upper(Cast('name', models.TextField())),
+                        name='gin_trgm_ops'),
+                name='ingredient_iname_trgm_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=('name', 'measurement_unit'),
+                                    name='unique_ingredient'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def refresh_search_index(self):
+        ingredients = IngredientRecipe.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe')
+        ingredient_names = ingredients.annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+        ingredient_ids = ingredients.annotate(
+            ids=ArrayAgg('ingredient_id', ordering='ingredient_id')
+        ).values('ids')
+        return self.update(
+            search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+                + SearchVector(Subquery(ingredient_names), weight='C',
+                               config=SEARCH_CONFIG)
+            ),
+            ingredient_ids=Coalesce(
+                Subquery(ingredient_ids),
+                Value([], output_field=ArrayField(models.BigIntegerField()))
+            ),
+        )
+
+    def latest_by_author(self, author_ids, limit=0):
+        if not author_ids:
+            return []
+        recipes = self.filter(author_id__in=author_ids)
+        if limit <= 0:
+            return list(recipes)
+        ranked = recipes.annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('author_id'),
+            order_by=(F('pub_date').desc(), F('id').desc()),
+        )).values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        table = self.model._meta.db_table
+        return list(self.raw(
+            f'SELECT * FROM {table} WHERE id IN ('
+            f'SELECT id FROM ({sql}) AS ranked WHERE row_number <= %s) '
+            f'ORDER BY pub_date DESC, id DESC',
+            (*params, limit)
+        ))
+
+
 class Recipe(models.Model):
     name = models.CharField(max_length=200, verbose_name='Название')
     text = models.TextField(verbose_name='Описание')
@@ -53,6 +124,10 @@ class Recipe(models.Model):
         verbose_name='Дата создания',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
     ingredients = models.ManyToManyField(Ingredient,
                                          through='IngredientRecipe')
 
@@ -61,11 +136,40 @@ class Recipe(models.Model):
         upload_to='recipes/',
         blank=True
     )
+    image_renditions = models.JSONField(
+        'Уменьшенные изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False)
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок', default=0, editable=False)
+    search_vector = SearchVectorField(
+        'Поисковый вектор', null=True, editable=False)
+    ingredient_ids = ArrayField(
+        models.BigIntegerField(),
+        verbose_name='Ингредиенты для поиска',
+        default=list,
+        blank=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date', '-id')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=('-pub_date', '-id'), name='recipe_feed_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='recipe_author_feed_idx'),
+            models.Index(fields=('-favorites_count', '-pub_date', '-id'),
+                         name='recipe_popular_idx'),
+            GinIndex(fields=('search_vector',), name='recipe_search_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -83,11 +187,140 @@ class IngredientRecipe(models.Model):
     class Meta:
         verbose_name = 'Связь Ингредиент-Рецепт'
         verbose_name_plural = 'Связи Ингредиент-Рецепт'
+        constraints = [
+            models.UniqueConstraint(fields=('recipe', 'ingredient'),
+                                    include=('amount',),
+                                    name='unique_ingredient_recipe'),
+        ]
 
     def __str__(self):
         return f'{self.ingredient}-{self.recipe}'
 
 
+class FollowQuerySet(models.QuerySet):
+
+    def change_followers(self, change, params, delta):
+        stats = AuthorStats._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH changed AS ({change}) '
+                f'INSERT INTO {stats} '
+                f'(author_id, recipes_count, followers_count) '
+                f'SELECT author_id, 0, GREATEST(%s, 0) FROM changed '
+                f'ON CONFLICT (author_id) DO UPDATE SET followers_count = '
+                f'GREATEST({stats}.followers_count + %s, 0) '
+                f'RETURNING author_id',
+                [*params, delta, delta])
+            return cursor.fetchone() is not None
+
+    def add(self, user_id, author_id):
+        table = self.model._meta.db_table
+        return self.change_followers(
+            f'INSERT INTO {table} (user_id, author_id) '
+            f'SELECT %s, id FROM {User._meta.db_table} WHERE id = %s '
+            f'ON CONFLICT DO NOTHING RETURNING author_id',
+            [user_id, author_id], 1)
+
+    def remove(self, user_id, author_id):
+        table = self.model._meta.db_table
+        return self.change_followers(
+            f'DELETE FROM {table} WHERE user_id = %s AND author_id = %s '
+            f'RETURNING author_id',
+            [user_id, author_id], -1)
+
+
+class RecipeRelationQuerySet(models.QuerySet):
+    counter = None
+    returned_fields = ('id', 'name', 'image', 'image_renditions',
+                       'cooking_time')
+
+    def added_effects(self):
+        return []
+
+    def removed_effects(self):
+        return []
+
+    def removed(self, user_id):
+        pass
+
+    def change_recipes(self, change, params, effects, delta):
+        recipes = Recipe._meta.db_table
+        columns = ', '.join(
+            f'{recipes}.{Recipe._meta.get_field(field).column}'
+            for field in self.returned_fields)
+        return list(Recipe.objects.raw(
+            f'WITH {", ".join([f"changed AS ({change})", *effects])} '
+            f'UPDATE {recipes} SET {self.counter} = '
+            f'GREATEST({recipes}.{self.counter} + %s, 0) '
+            f'FROM changed WHERE {recipes}.id = changed.recipe_id '
+            f'RETURNING {columns}',
+            [*params, delta]))
+
+    def add_many(self, user_id, recipe_ids):
+        table = self.model._meta.db_table
+        return self.change_recipes(
+            f'INSERT INTO {table} (user_id, recipe_id) '
+            f'SELECT %s, id FROM {Recipe._meta.db_table} '
+            f'WHERE id = ANY(%s) ORDER BY id '
+            f'ON CONFLICT DO NOTHING RETURNING user_id, recipe_id',
+            [user_id, list(recipe_ids)], self.added_effects(), 1)
+
+    def remove_many(self, user_id, recipe_ids):
+        table = self.model._meta.db_table
+        recipes = self.change_recipes(
+            f'DELETE FROM {table} WHERE user_id = %s '
+            f'AND recipe_id = ANY(%s) RETURNING user_id, recipe_id',
+            [user_id, list(recipe_ids)], self.removed_effects(), -1)
+        if recipes:
+            self.removed(user_id)
+        return recipes
+
+    def add(self, user_id, recipe_id):
+        return next(iter(self.add_many(user_id, [recipe_id])), None)
+
+    def remove(self, user_id, recipe_id):
+        return bool(self.remove_many(user_id, [recipe_id]))
+
+
+class FavoriteQuerySet(RecipeRelationQuerySet):
+    counter = 'favorites_count'
+
+
+class ShoppingCartQuerySet(RecipeRelationQuerySet):
+    counter = 'in_carts_count'
+
+    def added_effects(self):
+        totals = ShoppingCartTotal._meta.db_table
+        return [
+            f'totals AS (INSERT INTO {totals} '
+            f'(user_id, ingredient_id, amount) '
+            f'SELECT changed.user_id, ir.ingredient_id, SUM(ir.amount) '
+            f'FROM changed JOIN {IngredientRecipe._meta.db_table} ir '
+            f'ON ir.recipe_id = changed.recipe_id '
+            f'GROUP BY changed.user_id, ir.ingredient_id '
+            f'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+            f'SET amount = {totals}.amount + EXCLUDED.amount)',
+        ]
+
+    def removed_effects(self):
+        totals = ShoppingCartTotal._meta.db_table
+        return [
+            f'amounts AS (SELECT changed.user_id, ir.ingredient_id, '
+            f'SUM(ir.amount) AS amount '
+            f'FROM changed JOIN {IngredientRecipe._meta.db_table} ir '
+            f'ON ir.recipe_id = changed.recipe_id '
+            f'GROUP BY changed.user_id, ir.ingredient_id)',
+            f'decreased AS (UPDATE {totals} '
+            f'SET amount = {totals}.amount - amounts.amount '
+            f'FROM amounts WHERE {totals}.user_id = amounts.user_id '
+            f'AND {totals}.ingredient_id = amounts.ingredient_id)',
+        ]
+
+    def removed(self, user_id):
+        ShoppingCartTotal.objects.filter(
+            user_id=user_id, amount__lte=0).delete()
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -102,6 +335,8 @@ class Follow(models.Model):
         verbose_name='Автор'
     )
 
+    objects = FollowQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
@@ -128,6 +363,8 @@ class Favorite(models.Model):
         verbose_name='Рецепт'
     )
 
+    objects = FavoriteQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
@@ -154,6 +391,8 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт'
     )
 
+    objects = ShoppingCartQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
@@ -164,3 +403,171 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe} в списке покупок у {self.user}'
+
+
+class ShoppingCartTotalQuerySet(models.QuerySet):
+
+    def apply_recipe(self, recipe_id, sign=1, user_id=None):
+        table = self.model._meta.db_table
+        sql = (
+            f'INSERT INTO {table} (user_id, ingredient_id, amount) '
+            f'SELECT cart.user_id, ir.ingredient_id, SUM(ir.amount) * %s '
+            f'FROM {IngredientRecipe._meta.db_table} ir '
+            f'JOIN {ShoppingCart._meta.db_table} cart '
+            f'ON cart.recipe_id = ir.recipe_id '
+            f'WHERE ir.recipe_id = %s'
+        )
+        params = [sign, recipe_id]
+        if user_id is not None:
+            sql += ' AND cart.user_id = %s'
+            params.append(user_id)
+        sql += (
+            ' GROUP BY cart.user_id, ir.ingredient_id '
+            'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+            f'SET amount = {table}.amount + EXCLUDED.amount'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+        if sign < 0:
+            stale = self.filter(amount__lte=0)
+            if user_id is not None:
+                stale = stale.filter(user_id=user_id)
+            else:
+                stale = stale.filter(user__shopuser__recipe_id=recipe_id)
+            stale.delete()
+
+    def live(self):
+        return IngredientRecipe.objects.filter(
+            recipe__shoprecipe__isnull=False
+        ).values(
+            'ingredient_id', user_id=F('recipe__shoprecipe__user_id')
+        ).annotate(amount=Sum('amount')).order_by()
+
+    def add_recipe(self, recipe_id, user_id=None):
+        self.apply_recipe(recipe_id, 1, user_id)
+
+    def remove_recipe(self, recipe_id, user_id=None):
+        self.apply_recipe(recipe_id, -1, user_id)
+
+
+class ShoppingCartTotal(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shoptotals',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shoptotals',
+        verbose_name='Ингредиент'
+    )
+    amount = models.IntegerField(verbose_name='Количество')
+
+    objects = ShoppingCartTotalQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Итог списка покупок'
+        verbose_name_plural = 'Итоги списков покупок'
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'ingredient'),
+                                    name='unique_shopping_cart_total'),
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} ({self.amount}) у {self.user}'
+
+
+class AuthorStatsQuerySet(models.QuerySet):
+
+    def change_counters(self, author_id, **deltas):
+        table = self.model._meta.db_table
+        fields = ('recipes_count', 'followers_count')
+        values = [deltas.get(field, 0) for field in fields]
+        updates = ', '.join(f'{field} = GREATEST({table}.{field} + %s, 0)'
+                            for field in fields)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (author_id, {", ".join(fields)}) '
+                f'VALUES (%s, GREATEST(%s, 0), GREATEST(%s, 0)) '
+                f'ON CONFLICT (author_id) DO UPDATE SET {updates}',
+                [author_id, *values, *values])
+
+
+class AuthorStats(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    recipes_count = models.PositiveIntegerField('Рецептов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+
+    objects = AuthorStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'Статистика {self.author}'
+
+
+class SimilarRecipeQuerySet(models.QuerySet):
+
+    def store(self, recipe_ids, similar_ids, scores, computed_at):
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} '
+                f'(recipe_id, similar_id, score, computed_at) '
+                f'SELECT pair.*, %s FROM unnest('
+                f'%s::bigint[], %s::bigint[], %s::double precision[]) pair '
+                f'ON CONFLICT (recipe_id, similar_id) DO UPDATE '
+                f'SET score = EXCLUDED.score, '
+                f'computed_at = EXCLUDED.computed_at',
+                [computed_at, recipe_ids, similar_ids, scores])
+
+    def trim(self, recipe_ids, limit):
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ('
+                f'SELECT id FROM (SELECT id, row_number() OVER ('
+                f'PARTITION BY recipe_id ORDER BY score DESC, similar_id'
+                f') AS position FROM {table} WHERE recipe_id = ANY(%s)'
+                f') ranked WHERE position > %s)',
+                [recipe_ids, limit])
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_for',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField('Сходство')
+    computed_at = models.DateTimeField('Дата расчёта', db_index=True)
+
+    objects = SimilarRecipeQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(fields=('recipe', 'similar'),
+                                    name='unique_similar_recipe'),
+        ]
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}'
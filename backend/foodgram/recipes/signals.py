@@ -0,0 +1,35 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalog, matching
+from .models import Ingredient, Recipe, Tag
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(**kwargs):
+    transaction.on_commit(partial(catalog.bump_version, 'tags'))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(**kwargs):
+    transaction.on_commit(partial(catalog.bump_version, 'ingredients'))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(
+            ingredientrecipe__ingredient=instance).refresh_search_index()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipes_changed(**kwargs):
+    transaction.on_commit(partial(catalog.bump_version, 'recipes'))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    transaction.on_commit(partial(matching.discard, [instance.pk]))
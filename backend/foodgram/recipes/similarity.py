@@ -0,0 +1,93 @@
+from itertools import chain
+
+import numpy as np
+from scipy import sparse
+
+from .models import Recipe
+
+COMMON_INGREDIENTS = 32
+COMMON_SHARE = 0.05
+COMMON_MIN_RECIPES = 1000
+TAG_WEIGHT = 0.5
+
+
+def incidence(rows, columns, size):
+    columns = np.unique(columns, return_inverse=True)[1]
+    return sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+        shape=(size, columns.max() + 1 if len(columns) else 0))
+
+
+class RecipeVectors:
+
+    def __init__(self, recipe_ids, ingredients, tags):
+        self.recipe_ids = recipe_ids
+        frequency = np.bincount(ingredients.indices,
+                                minlength=ingredients.shape[1])
+        weights = 1 + np.log((1 + len(recipe_ids)) / (1 + frequency))
+        features = sparse.hstack([
+            ingredients @ sparse.diags(weights.astype(np.float32)),
+            tags * TAG_WEIGHT,
+        ]).tocsr()
+        norms = np.sqrt(features.multiply(features).sum(axis=1)).A1
+        norms[norms == 0] = 1
+        features = (sparse.diags(1 / norms) @ features).astype(np.float32)
+        common = np.zeros(features.shape[1], dtype=bool)
+        common[np.argsort(frequency)[-COMMON_INGREDIENTS:]] = True
+        common[:len(frequency)] &= frequency >= max(
+            COMMON_SHARE * len(recipe_ids), COMMON_MIN_RECIPES)
+        common[ingredients.shape[1]:] = True
+        self.dense = features[:, np.flatnonzero(common)].toarray()
+        self.sparse = features[:, np.flatnonzero(~common)].tocsr()
+        self.sparse_t = self.sparse.T.tocsr()
+
+    @classmethod
+    def load(cls):
+        recipe_ids, ingredient_lists = [], []
+        for recipe_id, ingredient_ids in Recipe.objects.order_by(
+                'id').values_list('id', 'ingredient_ids').iterator():
+            recipe_ids.append(recipe_id)
+            ingredient_lists.append(ingredient_ids)
+        recipe_ids = np.array(recipe_ids, dtype=np.int64)
+        lengths = np.fromiter(map(len, ingredient_lists), dtype=np.int64,
+                              count=len(ingredient_lists))
+        ingredients = incidence(
+            np.repeat(np.arange(len(recipe_ids)), lengths),
+            np.fromiter(chain.from_iterable(ingredient_lists),
+                        dtype=np.int64, count=lengths.sum()),
+            len(recipe_ids))
+        tag_pairs = np.array(
+            Recipe.tags.through.objects.values_list('recipe_id', 'tag_id'),
+            dtype=np.int64).reshape(-1, 2)
+        tag_pairs = tag_pairs[np.isin(tag_pairs[:, 0], recipe_ids)]
+        tags = incidence(np.searchsorted(recipe_ids, tag_pairs[:, 0]),
+                         tag_pairs[:, 1], len(recipe_ids))
+        return cls(recipe_ids, ingredients, tags)
+
+    def rows(self, recipe_ids):
+        return np.flatnonzero(np.isin(self.recipe_ids, recipe_ids))
+
+    def similarities(self, rows):
+        product = (self.sparse[rows] @ self.sparse_t).tocsr()
+        for position, row in enumerate(rows):
+            start, end = product.indptr[position:position + 2]
+            columns = product.indices[start:end]
+            scores = product.data[start:end]
+            scores += np.take(self.dense, columns, axis=0) @ self.dense[row]
+            scores[columns == row] = 0
+        product.eliminate_zeros()
+        return product
+
+
+def top_neighbours(product, limit):
+    positions, columns, scores = [], [], []
+    for position in range(product.shape[0]):
+        start, end = product.indptr[position:position + 2]
+        best = np.arange(end - start)
+        if len(best) > limit:
+            best = np.argpartition(-product.data[start:end], limit)[:limit]
+        positions.append(np.full(len(best), position))
+        columns.append(product.indices[start:end][best])
+        scores.append(product.data[start:end][best])
+    return (np.concatenate(positions), np.concatenate(columns),
+            np.concatenate(scores))
@@ -0,0 +1,132 @@
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.tests import LOCMEM_CACHES
+from api.views import RecipeViewSet, UserViewSet
+from recipes import catalog
+from recipes.management import plans
+from recipes.management.dataset import seed
+from recipes.models import (AuthorStats, Favorite, Follow, Ingredient,
+                            IngredientRecipe, Recipe, ShoppingCart,
+                            ShoppingCartTotal)
+
+User = get_user_model()
+
+THREADS = 8
+ROUNDS = 2
+SHARED_ROUNDS = 10
+PLAN_RECIPES = 5000
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConcurrentTogglesTest(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass')
+        self.author = User.objects.create_user(
+            username='author', email='author@example.com', password='pass')
+        self.recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            cooking_time=1)
+        self.ingredient = Ingredient.objects.create(
+            name='Ингредиент', measurement_unit='г')
+        IngredientRecipe.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=1)
+
+    def concurrently(self, viewset, calls):
+        factory = APIRequestFactory()
+        barrier = Barrier(len(calls))
+
+        def request(call):
+            name, method, pk = call
+            try:
+                request = getattr(factory, method)(f'/{pk}/{name}/')
+                force_authenticate(request, user=self.user)
+                view = viewset.as_view({method: name})
+                barrier.wait()
+                return view(request, pk=str(pk)).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(len(calls)) as executor:
+            return Counter(executor.map(request, calls))
+
+    def hammer(self, viewset, name, method, pk):
+        return self.concurrently(viewset, [(name, method, pk)] * THREADS)
+
+    def assert_toggle(self, viewset, name, pk, rows, counter):
+        for _ in range(ROUNDS):
+            for method, success, expected in (('post', 201, 1),
+                                              ('delete', 204, 0)):
+                with self.subTest(name=name, method=method):
+                    statuses = self.hammer(viewset, name, method, pk)
+                    self.assertEqual(statuses[success], 1, statuses)
+                    self.assertEqual(statuses[400], THREADS - 1, statuses)
+                    self.assertEqual((rows(), counter()),
+                                     (expected, expected))
+
+    def test_favorite(self):
+        self.assert_toggle(
+            RecipeViewSet, 'favorite', self.recipe.id,
+            Favorite.objects.filter(user=self.user).count,
+            lambda: Recipe.objects.get(pk=self.recipe.id).favorites_count)
+
+    def test_shopping_cart(self):
+        self.assert_toggle(
+            RecipeViewSet, 'shopping_cart', self.recipe.id,
+            ShoppingCart.objects.filter(user=self.user).count,
+            lambda: Recipe.objects.get(pk=self.recipe.id).in_carts_count)
+        self.assertFalse(
+            ShoppingCartTotal.objects.filter(user=self.user).exists())
+
+    def test_shopping_cart_shared_ingredient(self):
+        other = Recipe.objects.create(
+            author=self.author, name='Другой рецепт', text='Описание',
+            cooking_time=1)
+        IngredientRecipe.objects.create(
+            recipe=other, ingredient=self.ingredient, amount=2)
+        remove = [('shopping_cart', 'delete', self.recipe.id),
+                  ('shopping_cart', 'delete', other.id)]
+        add_one_remove_other = [('shopping_cart', 'post', self.recipe.id),
+                                ('shopping_cart', 'delete', other.id)]
+        totals = ShoppingCartTotal.objects.filter(user=self.user)
+        for _ in range(SHARED_ROUNDS):
+            for recipe in (self.recipe, other):
+                ShoppingCart.objects.add(self.user.id, recipe.id)
+            self.concurrently(RecipeViewSet, remove)
+            self.assertFalse(totals.exists())
+            ShoppingCart.objects.add(self.user.id, other.id)
+            self.concurrently(RecipeViewSet, add_one_remove_other)
+            self.assertEqual(list(totals.values_list('amount', flat=True)),
+                             [1])
+            ShoppingCart.objects.remove(self.user.id, self.recipe.id)
+
+    def test_subscribe(self):
+        self.assert_toggle(
+            UserViewSet, 'subscribe', self.author.id,
+            Follow.objects.filter(user=self.user).count,
+            lambda: AuthorStats.objects.get(
+                author=self.author).followers_count)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryPlansTest(TestCase):
+
+    def test_hot_queries_use_indexes(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        catalog._loaded.clear()
+        random.seed(PLAN_RECIPES)
+        user, author, recipe = seed(PLAN_RECIPES)
+        for name, queryset in plans.hot_queries(user, author, recipe).items():
+            with self.subTest(query=name):
+                self.assertEqual(plans.seq_scans(plans.explain(queryset)), [])